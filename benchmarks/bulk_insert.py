@@ -0,0 +1,54 @@
+"""
+Compares inserting planets one POST at a time against a single POST /planets/bulk.
+
+    python benchmarks/bulk_insert.py --rows 10000
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--rows", type=int, default=10000)
+args = parser.parse_args()
+
+db_file = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ["DATABASE_URL"] = os.getenv("BENCH_DATABASE_URL", f"sqlite:///{db_file}")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from app import app  # noqa: E402
+from models import db, Planet  # noqa: E402
+
+
+def planet(i):
+    return {"planet_name": f"planet-{i}", "periodo_de_rotacion": i,
+            "climate": "arid", "poblation": i * 1000}
+
+
+def reset():
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+
+client = app.test_client()
+
+reset()
+start = time.perf_counter()
+for i in range(args.rows):
+    client.post("/planets", json=planet(i))
+single = time.perf_counter() - start
+
+reset()
+start = time.perf_counter()
+client.post("/planets/bulk", json=[planet(i) for i in range(args.rows)])
+bulk = time.perf_counter() - start
+
+with app.app_context():
+    assert Planet.query.count() == args.rows
+
+print(f"rows:        {args.rows}")
+print(f"single-row:  {single:8.3f}s  {args.rows / single:10.0f} rows/s")
+print(f"bulk:        {bulk:8.3f}s  {args.rows / bulk:10.0f} rows/s")
+print(f"speedup:     {single / bulk:8.1f}x")
@@ -0,0 +1,153 @@
+"""
+Shared helpers for the benchmark scripts: seeding a database with
+configurable volumes, starting servers and driving concurrent load.
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import statistics
+import subprocess
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SRC = os.path.join(ROOT, "src")
+
+
+def seed(database_url, users=100, planets=1000, people=1000, vehicles=1000, favorites=10000):
+    """Recreates the schema at database_url and fills it with fake rows."""
+    os.environ["DATABASE_URL"] = database_url
+    if SRC not in sys.path:
+        sys.path.insert(0, SRC)
+    from sqlalchemy import insert
+    from app import app
+    from models import db, User, Planet, People, Vehicle, Favorite
+    from stats import rebuild_counts
+
+    rng = random.Random(42)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.execute(insert(User), [
+            {"email": f"user{i}@example.com", "first_name": f"user{i}",
+             "password": "secret", "is_active": True} for i in range(users)])
+        db.session.execute(insert(Planet), [
+            {"planet_name": f"planet{i}", "periodo_de_rotacion": rng.randint(10, 500),
+             "climate": rng.choice(["arid", "temperate", "frozen", "murky"]),
+             "poblation": rng.randint(0, 10**9)} for i in range(planets)])
+        db.session.execute(insert(People), [
+            {"name": f"character{i}", "age": rng.randint(1, 900),
+             "hair_color": rng.choice(["brown", "black", "blond", "none"]),
+             "birth_year": rng.randint(0, 200)} for i in range(people)])
+        db.session.execute(insert(Vehicle), [
+            {"model": f"vehicle{i}", "speed": rng.randint(10, 2000),
+             "pilot": f"pilot{rng.randint(0, 50)}", "length": rng.randint(1, 500)}
+            for i in range(vehicles)])
+        # favorites are unique per (user, target)
+        targets = [(column, count) for column, count in
+                   (("planet_id", planets), ("vehicles_id", vehicles), ("characters_id", people))
+                   if count]
+        capacity = users * sum(count for _, count in targets)
+        seen = set()
+        rows = []
+        while len(rows) < min(favorites, capacity):
+            column, count = targets[len(rows) % len(targets)]
+            key = (rng.randint(1, users), column, rng.randint(1, count))
+            if key in seen:
+                continue
+            seen.add(key)
+            row = {"user_id": key[0], "planet_id": None, "vehicles_id": None,
+                   "characters_id": None}
+            row[column] = key[2]
+            rows.append(row)
+        if rows:
+            db.session.execute(insert(Favorite), rows)
+        rebuild_counts()
+        db.session.commit()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(command, port, env=None, timeout=30):
+    """Starts a server process and waits until it answers on port."""
+    process = subprocess.Popen(command, cwd=ROOT, env={**os.environ, **(env or {})},
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/health/db", timeout=1)
+            return process
+        except (urllib.error.URLError, ConnectionError, OSError):
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"server did not start: {' '.join(command)}")
+
+
+def request(url, method="GET", headers=None, body=None):
+    """Returns (latency in seconds, status, response headers); body is sent as JSON."""
+    headers = dict(headers or {})
+    data = None
+    if body is not None:
+        data = json.dumps(body).encode()
+        headers["Content-Type"] = "application/json"
+    start = time.perf_counter()
+    req = urllib.request.Request(url, data=data, method=method, headers=headers)
+    try:
+        with urllib.request.urlopen(req, timeout=30) as response:
+            response.read()
+            status, response_headers = response.status, response.headers
+    except urllib.error.HTTPError as error:
+        error.read()
+        status, response_headers = error.code, error.headers
+    except (urllib.error.URLError, ConnectionError, OSError):
+        status, response_headers = 599, {}
+    return time.perf_counter() - start, status, response_headers
+
+
+def run_requests(make_request, concurrency=10, total=1000):
+    """Sends make_request(i) -> (method, url, body) for i in range(total) from
+    `concurrency` threads and returns latency, status and SQL count stats."""
+    def send(i):
+        method, url, body = make_request(i)
+        return request(url, method=method, body=body)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(send, range(total)))
+    elapsed = time.perf_counter() - start
+    result = summarize([latency for latency, _, _ in results],
+                       sum(1 for _, status, _ in results if status >= 500), elapsed)
+    result["4xx"] = sum(1 for _, status, _ in results if 400 <= status < 500)
+    # X-SQL-Count is only sent when the server runs with PROFILING=1
+    counts = [int(headers["X-SQL-Count"]) for _, _, headers in results
+              if headers.get("X-SQL-Count") is not None]
+    if counts:
+        result["sql_avg"] = round(statistics.mean(counts), 2)
+        result["sql_max"] = max(counts)
+    return result
+
+
+def run_load(urls, concurrency=10, total=1000):
+    """Hits urls round-robin from `concurrency` threads, returns latency stats."""
+    return run_requests(lambda i: ("GET", urls[i % len(urls)], None), concurrency, total)
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(quantiles[49] * 1000, 2),
+        "p95_ms": round(quantiles[94] * 1000, 2),
+        "p99_ms": round(quantiles[98] * 1000, 2),
+    }
@@ -0,0 +1,59 @@
+"""
+Bytes on the wire and CPU per request of the list routes for each
+Accept-Encoding, with the response cache cold (compressing every time)
+and warm (serving the precompressed bytes).
+
+    python benchmarks/compression.py --requests 200
+    COMPRESS_GZIP_LEVEL=9 python benchmarks/compression.py
+
+Runs in-process through the Flask test client so CPU time is measured
+with time.process_time(); the bytes are the same gunicorn sends.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(__file__))
+from common import seed  # noqa: E402
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--database-url")
+parser.add_argument("--requests", type=int, default=200)
+args = parser.parse_args()
+
+database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+seed(database_url, users=100, planets=2000, people=2000, vehicles=2000, favorites=20000)
+
+from app import create_app  # noqa: E402
+from compression import ENABLED  # noqa: E402
+
+PATHS = ["/planets?limit=500", "/people?limit=500", "/favorites?limit=500"]
+ENCODINGS = ["identity"] + ENABLED
+
+OPTIONS = {"ADMIN_ENABLED": False, "SWAGGER_ENABLED": False, "MIGRATE_ENABLED": False}
+# a zero TTL expires every entry as soon as it is stored: always cold
+clients = {warm: create_app(CACHE_TTL=60 if warm else 0, **OPTIONS).test_client()
+           for warm in (False, True)}
+
+
+def measure(path, encoding, warm):
+    client = clients[warm]
+    headers = {"Accept-Encoding": encoding}
+    response = client.get(path, headers=headers)
+    assert response.status_code == 200, response.status_code
+    size = len(response.get_data())
+    start = time.process_time()
+    for _ in range(args.requests):
+        client.get(path, headers=headers)
+    cpu = (time.process_time() - start) / args.requests
+    return size, cpu
+
+
+print(f"{'path':22} {'encoding':9} {'bytes':>9} {'cold ms':>9} {'warm ms':>9}")
+for path in PATHS:
+    for encoding in ENCODINGS:
+        size, cold = measure(path, encoding, warm=False)
+        _, warm = measure(path, encoding, warm=True)
+        print(f"{path:22} {encoding:9} {size:>9} {cold * 1000:>9.3f} {warm * 1000:>9.3f}")
@@ -0,0 +1,75 @@
+"""
+Cold-start cost of the app: `python -X importtime` plus the time to build
+the app with create_app(), with every optional component enabled and for
+an API-only worker (no admin, swagger or migrations).
+
+    python benchmarks/import_time.py --runs 5 --top 10
+
+Each run is a fresh interpreter, so nothing is cached in sys.modules.
+"""
+import os
+import sys
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+sys.path.insert(0, os.path.dirname(__file__))
+from common import seed, SRC  # noqa: E402
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--database-url")
+parser.add_argument("--runs", type=int, default=5)
+parser.add_argument("--top", type=int, default=10)
+args = parser.parse_args()
+
+database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+seed(database_url, users=10, planets=10, people=10, vehicles=10, favorites=30)
+
+SCRIPT = """
+import time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app({options})
+print(f"{{imported - start}} {{time.perf_counter() - imported}}")
+"""
+
+MODES = {
+    "full": "",
+    "api-only": "ADMIN_ENABLED=False, SWAGGER_ENABLED=False, MIGRATE_ENABLED=False",
+}
+
+
+def run(options):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", SCRIPT.format(options=options)],
+        cwd=SRC, env={**os.environ, "DATABASE_URL": database_url},
+        capture_output=True, text=True, check=True)
+    import_seconds, create_seconds = map(float, result.stdout.split()[-2:])
+    modules = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # " app" is the module itself, "   flask" what it imports directly
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth <= 1 and name.strip() != "app":
+            modules.append((int(cumulative), name.strip()))
+    return import_seconds, create_seconds, modules
+
+
+print(f"{'mode':9} {'import ms':>10} {'create_app ms':>14} {'total ms':>9}")
+heaviest = {}
+for mode, options in MODES.items():
+    runs = [run(options) for _ in range(args.runs)]
+    imports = statistics.median(r[0] for r in runs) * 1000
+    creates = statistics.median(r[1] for r in runs) * 1000
+    print(f"{mode:9} {imports:>10.1f} {creates:>14.1f} {imports + creates:>9.1f}")
+    heaviest[mode] = sorted(runs[-1][2], reverse=True)[:args.top]
+
+for mode, modules in heaviest.items():
+    print(f"\nheaviest imports ({mode}):")
+    for cumulative, name in modules:
+        print(f"  {cumulative / 1000:>8.1f} ms  {name}")
@@ -0,0 +1,46 @@
+"""
+Micro-benchmark of the JSON provider: stdlib json vs orjson on a
+favorites-shaped payload, checking that both produce the same bytes.
+
+    python benchmarks/json_encoding.py --items 20000
+"""
+import os
+import sys
+import timeit
+import argparse
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--items", type=int, default=20000)
+parser.add_argument("--repeat", type=int, default=20)
+args = parser.parse_args()
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from flask import Flask  # noqa: E402
+import json_provider  # noqa: E402
+from json_provider import FastJSONProvider  # noqa: E402
+
+payload = [{
+    "id": i, "user_id": i % 50, "planet_id": i, "vehicles_id": None,
+    "characters_id": None, "user_name": f"usuario-{i % 50}",
+    "user_email": f"usuario{i % 50}@example.com", "planet_name": f"Tatooine {i}",
+} for i in range(args.items)]
+
+app = Flask(__name__)
+app.json = FastJSONProvider(app)
+
+with app.app_context():
+    fast_body = app.json.response(payload).get_data()
+    fast = min(timeit.repeat(lambda: app.json.response(payload), number=1, repeat=args.repeat))
+
+    orjson = json_provider.orjson
+    json_provider.orjson = None
+    stdlib_body = app.json.response(payload).get_data()
+    stdlib = min(timeit.repeat(lambda: app.json.response(payload), number=1, repeat=args.repeat))
+    json_provider.orjson = orjson
+
+assert fast_body == stdlib_body, "orjson and stdlib output differ"
+print(f"items:   {args.items}  ({len(fast_body) / 2**20:.1f} MiB)")
+print(f"stdlib:  {stdlib * 1000:8.2f} ms")
+print(f"orjson:  {fast * 1000:8.2f} ms" + ("" if orjson else "  (orjson not installed)"))
+print(f"speedup: {stdlib / fast:8.1f}x")
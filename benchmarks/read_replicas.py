@@ -0,0 +1,71 @@
+"""
+Read-replica routing with two database files: seeds the primary, copies
+it as the replica, then checks routing and compares read throughput of
+the primary alone against primary + replica.
+
+    python benchmarks/read_replicas.py
+    python benchmarks/read_replicas.py --primary-url postgresql://.../primary \\
+        --replica-url postgresql://.../replica
+
+With the default SQLite files the replica is a frozen copy, so writes made
+after the copy only show up where reads hit the primary. That makes the
+routing visible: a client that just wrote (read_primary_until cookie)
+sees its write, any other client does not.
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(__file__))
+from common import seed, free_port, start_server, run_load, request  # noqa: E402
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--primary-url")
+parser.add_argument("--replica-url")
+parser.add_argument("--concurrency", type=int, default=8)
+parser.add_argument("--requests", type=int, default=1000)
+args = parser.parse_args()
+
+directory = tempfile.mkdtemp()
+primary_url = args.primary_url or f"sqlite:///{os.path.join(directory, 'primary.db')}"
+replica_url = args.replica_url or f"sqlite:///{os.path.join(directory, 'replica.db')}"
+seed(primary_url, users=100, planets=2000, people=2000, vehicles=2000, favorites=20000)
+if not args.replica_url:
+    shutil.copy(os.path.join(directory, "primary.db"), os.path.join(directory, "replica.db"))
+
+PATHS = ["/planets?limit=100&sort=-poblation", "/favorites?limit=100", "/people?limit=100"]
+COMMAND = ["gunicorn", "app:create_app()", "--chdir", "src", "-w", "2", "-b"]
+
+
+def planet_names(url, headers=None):
+    req = urllib.request.Request(url, headers=headers or {})
+    with urllib.request.urlopen(req) as response:
+        return {planet["planet_name"] for planet in json.load(response)}
+
+
+for label, replicas in (("primary only", ""), ("with replica", replica_url)):
+    port = free_port()
+    server = start_server(COMMAND + [f"127.0.0.1:{port}"], port, env={
+        "DATABASE_URL": primary_url, "DATABASE_REPLICA_URLS": replicas, "CACHE_TTL": "0"})
+    base = f"http://127.0.0.1:{port}"
+    try:
+        result = run_load([base + path for path in PATHS], args.concurrency, args.requests)
+        print(f"{label:13} rps={result['rps']} p50={result['p50_ms']}ms p95={result['p95_ms']}ms "
+              f"errors={result['errors']}")
+
+        if replicas and not args.replica_url:
+            name = f"replica-check-{port}"
+            _, status, headers = request(base + "/planets", method="POST", body={
+                "planet_name": name, "periodo_de_rotacion": 1, "climate": "arid", "poblation": 1})
+            cookie = headers.get("Set-Cookie", "").split(";")[0]
+            url = f"{base}/planets?fields=planet_name&planet_name={name}"
+            print(f"  write {status}; writer sees it: {name in planet_names(url, {'Cookie': cookie})}; "
+                  f"other client sees it: {name in planet_names(url)}; "
+                  f"X-Read-Primary sees it: {name in planet_names(url, {'X-Read-Primary': '1'})}")
+    finally:
+        server.terminate()
+        server.wait()
@@ -0,0 +1,68 @@
+"""
+Compares the ORM serialize() path against the column-projection path
+(Model.rows() + Model.serialize_row) for listing planets.
+
+    python benchmarks/serialization.py --rows 50000
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--rows", type=int, default=50000)
+parser.add_argument("--repeat", type=int, default=5)
+args = parser.parse_args()
+
+db_file = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ["DATABASE_URL"] = os.getenv("BENCH_DATABASE_URL", f"sqlite:///{db_file}")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from sqlalchemy import insert  # noqa: E402
+from app import app  # noqa: E402
+from models import db, Planet  # noqa: E402
+
+
+def orm_path():
+    return [planet.serialize() for planet in Planet.query.order_by(Planet.id).all()]
+
+
+def projection_path():
+    return [Planet.serialize_row(row) for row in Planet.rows().order_by(Planet.id).all()]
+
+
+def measure(fn):
+    best = float("inf")
+    for _ in range(args.repeat):
+        db.session.expunge_all()
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    db.session.expunge_all()
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+with app.app_context():
+    db.drop_all()
+    db.create_all()
+    db.session.execute(insert(Planet), [
+        {"planet_name": f"planet-{i}", "periodo_de_rotacion": i,
+         "climate": "arid", "poblation": i * 1000}
+        for i in range(args.rows)
+    ])
+    db.session.commit()
+
+    assert orm_path() == projection_path()
+    orm_time, orm_peak = measure(orm_path)
+    projection_time, projection_peak = measure(projection_path)
+
+print(f"rows:        {args.rows}")
+print(f"serialize(): {orm_time * 1000:8.1f} ms  peak {orm_peak / 2**20:7.1f} MiB")
+print(f"projection:  {projection_time * 1000:8.1f} ms  peak {projection_peak / 2**20:7.1f} MiB")
+print(f"speedup:     {orm_time / projection_time:8.1f}x")
@@ -0,0 +1,31 @@
+"""user_favorites materialized table
+
+Revision ID: 7a1c4e9b3d20
+Revises: 5f3b9c1d2e4a
+Create Date: 2026-10-17 14:41:08.733205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a1c4e9b3d20'
+down_revision = '5f3b9c1d2e4a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user_favorites',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('user_name', sa.String(length=120), nullable=False),
+    sa.Column('favorites', sa.JSON(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    # las filas se rellenan al leer o escribir los favoritos de cada usuario
+
+
+def downgrade():
+    op.drop_table('user_favorites')
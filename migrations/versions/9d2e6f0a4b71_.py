@@ -0,0 +1,40 @@
+"""unique favorites per user and target
+
+Revision ID: 9d2e6f0a4b71
+Revises: 7a1c4e9b3d20
+Create Date: 2026-10-17 16:05:52.119874
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d2e6f0a4b71'
+down_revision = '7a1c4e9b3d20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # antes de crear las restricciones borramos los duplicados existentes,
+    # conservando el favorito más antiguo
+    for column in ('planet_id', 'vehicles_id', 'characters_id'):
+        op.execute(
+            f"DELETE FROM favorite WHERE {column} IS NOT NULL AND id NOT IN ("
+            f"SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM favorite "
+            f"WHERE {column} IS NOT NULL GROUP BY user_id, {column}) AS keep)")
+    # la tabla materializada se recalcula al leer
+    op.execute("DELETE FROM user_favorites")
+
+    with op.batch_alter_table('favorite', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_favorite_user_planet', ['user_id', 'planet_id'])
+        batch_op.create_unique_constraint('uq_favorite_user_vehicle', ['user_id', 'vehicles_id'])
+        batch_op.create_unique_constraint('uq_favorite_user_character', ['user_id', 'characters_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('favorite', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_favorite_user_character', type_='unique')
+        batch_op.drop_constraint('uq_favorite_user_vehicle', type_='unique')
+        batch_op.drop_constraint('uq_favorite_user_planet', type_='unique')
@@ -0,0 +1,43 @@
+"""trigram search indexes (postgres only)
+
+Revision ID: b3f81c2a5e06
+Revises: 9d2e6f0a4b71
+Create Date: 2026-10-17 17:22:40.561093
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3f81c2a5e06'
+down_revision = '9d2e6f0a4b71'
+branch_labels = None
+depends_on = None
+
+# índice GIN trigram por cada columna que usa GET /search
+SEARCH_COLUMNS = [
+    ('planet', 'planet_name'),
+    ('planet', 'climate'),
+    ('people', 'name'),
+    ('people', 'hair_color'),
+    ('vehicle', 'model'),
+    ('vehicle', 'pilot'),
+]
+
+
+def upgrade():
+    # en SQLite la búsqueda usa un índice en memoria
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table, column in SEARCH_COLUMNS:
+        op.create_index(f'ix_{table}_{column}_trgm', table, [column], unique=False,
+                        postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'})
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table, column in reversed(SEARCH_COLUMNS):
+        op.drop_index(f'ix_{table}_{column}_trgm', table_name=table)
@@ -0,0 +1,42 @@
+"""composite indexes for list filters and sorting
+
+Revision ID: c6a0d94e1f38
+Revises: b3f81c2a5e06
+Create Date: 2026-10-17 18:47:15.208364
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6a0d94e1f38'
+down_revision = 'b3f81c2a5e06'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('planet', schema=None) as batch_op:
+        batch_op.create_index('ix_planet_climate_poblation', ['climate', 'poblation'], unique=False)
+        batch_op.create_index('ix_planet_poblation', ['poblation'], unique=False)
+
+    with op.batch_alter_table('people', schema=None) as batch_op:
+        batch_op.create_index('ix_people_hair_color_age', ['hair_color', 'age'], unique=False)
+
+    with op.batch_alter_table('vehicle', schema=None) as batch_op:
+        batch_op.create_index('ix_vehicle_speed', ['speed'], unique=False)
+        batch_op.create_index('ix_vehicle_pilot_speed', ['pilot', 'speed'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('vehicle', schema=None) as batch_op:
+        batch_op.drop_index('ix_vehicle_pilot_speed')
+        batch_op.drop_index('ix_vehicle_speed')
+
+    with op.batch_alter_table('people', schema=None) as batch_op:
+        batch_op.drop_index('ix_people_hair_color_age')
+
+    with op.batch_alter_table('planet', schema=None) as batch_op:
+        batch_op.drop_index('ix_planet_poblation')
+        batch_op.drop_index('ix_planet_climate_poblation')
@@ -0,0 +1,46 @@
+"""favorite_count counters for the stats endpoints
+
+Revision ID: e4b7c2d91a53
+Revises: c6a0d94e1f38
+Create Date: 2026-10-17 21:12:40.531872
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b7c2d91a53'
+down_revision = 'c6a0d94e1f38'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('favorite_count',
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('target_id', sa.Integer(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('kind', 'target_id')
+    )
+    with op.batch_alter_table('favorite_count', schema=None) as batch_op:
+        batch_op.create_index('ix_favorite_count_kind_count', ['kind', 'count', 'target_id'], unique=False)
+
+    # contadores iniciales a partir de los favoritos existentes
+    op.execute("""
+        INSERT INTO favorite_count (kind, target_id, count)
+        SELECT 'user', user_id, COUNT(*) FROM favorite GROUP BY user_id
+        UNION ALL
+        SELECT 'planet', planet_id, COUNT(*) FROM favorite WHERE planet_id IS NOT NULL GROUP BY planet_id
+        UNION ALL
+        SELECT 'vehicle', vehicles_id, COUNT(*) FROM favorite WHERE vehicles_id IS NOT NULL GROUP BY vehicles_id
+        UNION ALL
+        SELECT 'character', characters_id, COUNT(*) FROM favorite WHERE characters_id IS NOT NULL GROUP BY characters_id
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('favorite_count', schema=None) as batch_op:
+        batch_op.drop_index('ix_favorite_count_kind_count')
+
+    op.drop_table('favorite_count')
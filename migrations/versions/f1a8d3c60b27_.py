@@ -0,0 +1,29 @@
+"""table_version counters for ETags and caches
+
+Revision ID: f1a8d3c60b27
+Revises: e4b7c2d91a53
+Create Date: 2026-10-18 10:04:12.817305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1a8d3c60b27'
+down_revision = 'e4b7c2d91a53'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # las filas se crean con la primera escritura en cada tabla
+    op.create_table('table_version',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('table_version')
@@ -0,0 +1,74 @@
+# Pantalla de inicio en una sola petición: planetas, personajes, vehículos
+# y favoritos del usuario. Cada recurso es una consulta independiente que
+# se lanza en un pool de hilos acotado, cada una con su propia sesión (y
+# su propia conexión del pool), así el tiempo total se acerca al de la
+# consulta más lenta y no a la suma. AGGREGATE_WORKERS no debería pasar
+# de DB_POOL_SIZE + DB_MAX_OVERFLOW.
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from flask import g
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from models import db, User, Planet, People, Vehicle, Favorite, UserFavorites
+from pagination import keyset, split_page
+
+AGGREGATE_WORKERS = int(os.getenv("AGGREGATE_WORKERS", 4))
+
+RESOURCES = ("planets", "people", "vehicles", "favorites")
+
+executor = ThreadPoolExecutor(max_workers=AGGREGATE_WORKERS, thread_name_prefix="aggregate")
+
+
+def catalog_page(model, limit):
+    # primera página del listado, igual que GET /planets?limit=n
+    def load(session):
+        query = keyset(model.select_rows(), model.id, limit, None)
+        rows, next_cursor = split_page(session.execute(query).all(), limit)
+        return {"items": [model.serialize_row(row) for row in rows], "next_cursor": next_cursor}
+    return load
+
+
+def user_favorites(user_id):
+    # desde user_favorites; si el usuario aún no está materializado se
+    # calcula al vuelo (sin escribir: esto puede ir a una réplica)
+    def load(session):
+        entry = session.execute(
+            select(UserFavorites.favorites).where(UserFavorites.user_id == user_id)).first()
+        if entry is not None:
+            return entry.favorites
+        rows = session.execute(
+            Favorite.select_with_names().where(Favorite.user_id == user_id).order_by(Favorite.id))
+        return [Favorite.serialize_with_names(row) for row in rows]
+    return load
+
+
+def resources(user_id, limit):
+    return {
+        "planets": catalog_page(Planet, limit),
+        "people": catalog_page(People, limit),
+        "vehicles": catalog_page(Vehicle, limit),
+        "favorites": user_favorites(user_id),
+    }
+
+
+def run(engine, load):
+    with Session(bind=engine) as session:
+        return load(session)
+
+
+def aggregate(user_id, limit, names=None):
+    # None si el usuario no existe; si no, {recurso: resultado}
+    engine = g.get("read_replica") or db.engine
+    loads = resources(user_id, limit)
+    if names:
+        loads = {name: load for name, load in loads.items() if name in names}
+
+    futures = {name: executor.submit(run, engine, load) for name, load in loads.items()}
+    # el usuario se consulta mientras tanto en el hilo de la petición
+    user = run(engine, lambda session: session.execute(
+        User.select_rows().where(User.id == user_id)).first())
+    results = {name: future.result() for name, future in futures.items()}
+    if user is None:
+        return None
+    return {"user": User.serialize_row(user), **results}
@@ -2,53 +2,221 @@
 This module takes care of starting the API Server, Loading the DB and Adding the endpoints
 """
 import os
-from flask import Flask, request, jsonify, url_for
-from flask_migrate import Migrate
-from flask_swagger import swagger
+from flask import Flask, Blueprint, request, jsonify, current_app
 from flask_cors import CORS
+from sqlalchemy import delete, or_
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from utils import APIException, generate_sitemap
-from admin import setup_admin
-from models import db, User, Planet, People, Vehicle, Favorite
+from pagination import paginate, page_args, page_response, ordered
+from filters import apply_filters, parse_filters, parse_sort
+from fields import parse_sparse, embed
+from streaming import wants_stream, stream_query
+from cache import cache, cached, init_cache
+from etag import conditional
+from json_provider import FastJSONProvider
+from compression import init_compression
+from pool_metrics import engine_options, init_pool_metrics, pool_status, ping
+from profiling import Profiler
+from replicas import router as replicas, replica_binds
+from resolver import NameResolver, resolver
+from materialized import refresh_user_favorites, user_favorites
+from search import SearchIndex, search, search_index, uses_postgres
+from aggregate import aggregate, RESOURCES
+from group_commit import GroupCommitter, group_commit
+from stats import LEADERBOARDS, bump_counts, top, user_counts
+from ratelimit import RateLimiter, limiter, limit, expensive
+from models import db, insert_ignore, insert_returning, User, Planet, People, Vehicle, Favorite
 # from models import Person
 
-app = Flask(__name__)
-app.url_map.strict_slashes = False
+# Flask-Admin, flask-swagger y Flask-Migrate (alembic) son lo más caro de
+# importar: solo se cargan si se activan. Los workers que solo sirven la
+# API pueden arrancar sin ellos, p. ej.:
+#
+#   gunicorn "app:create_app(ADMIN_ENABLED=False, SWAGGER_ENABLED=False, MIGRATE_ENABLED=False)"
+api = Blueprint('api', __name__)
 
-db_url = os.getenv("DATABASE_URL")
-if db_url is not None:
-    app.config['SQLALCHEMY_DATABASE_URI'] = db_url.replace(
-        "postgres://", "postgresql://")
-else:
-    app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:////tmp/test.db"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# máximo de elementos aceptados por los endpoints /bulk
+MAX_BULK_SIZE = int(os.getenv("MAX_BULK_SIZE", 10000))
 
-MIGRATE = Migrate(app, db)
-db.init_app(app)
-CORS(app)
-setup_admin(app)
+
+def env_flag(name, default=True):
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.lower() in ("1", "true", "yes")
+
+
+def swagger_spec():
+    from flask_swagger import swagger
+    return jsonify(swagger(current_app)), 200
+
+
+def create_app(**config):
+    app = Flask(__name__)
+    app.url_map.strict_slashes = False
+    app.json = FastJSONProvider(app)
+
+    db_url = os.getenv("DATABASE_URL")
+    if db_url is not None:
+        app.config['SQLALCHEMY_DATABASE_URI'] = db_url.replace(
+            "postgres://", "postgresql://")
+    else:
+        app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:////tmp/test.db"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['ADMIN_ENABLED'] = env_flag("ADMIN_ENABLED")
+    app.config['SWAGGER_ENABLED'] = env_flag("SWAGGER_ENABLED")
+    app.config['MIGRATE_ENABLED'] = env_flag("MIGRATE_ENABLED")
+    app.config.update(config)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(
+        app.config['SQLALCHEMY_DATABASE_URI']))
+    # réplicas de lectura opcionales (DATABASE_REPLICA_URLS)
+    app.config.setdefault('SQLALCHEMY_BINDS', replica_binds(engine_options))
+
+    db.init_app(app)
+    replicas.init_app(app, db)
+    # estado propio de cada app en app.extensions, configurado con app.config
+    init_cache(app)
+    NameResolver().init_app(app)
+    SearchIndex().init_app(app)
+    GroupCommitter().init_app(app)
+    RateLimiter().init_app(app)
+    CORS(app)
+    init_compression(app)
+    app.register_blueprint(api)
+
+    if app.config['MIGRATE_ENABLED']:
+        from flask_migrate import Migrate
+        Migrate(app, db)
+    if app.config['ADMIN_ENABLED']:
+        from admin import setup_admin
+        setup_admin(app)
+    if app.config['SWAGGER_ENABLED']:
+        app.add_url_rule('/swagger', 'swagger', swagger_spec)
+
+    # precarga del índice nombre -> id usado por los endpoints de favoritos
+    with app.app_context():
+        # contadores separados para el primario y cada réplica
+        for engine in db.engines.values():
+            init_pool_metrics(engine)
+        # instrumentación por petición, solo si se activa con PROFILING=1
+        Profiler().init_app(app, db.engine)
+        resolver.warm()
+        if not uses_postgres():
+            search_index.sync()
+
+    return app
+
+
+def __getattr__(name):
+    # `from app import app` (wsgi.py, asgi.py, FLASK_APP=src/app.py) crea la
+    # aplicación con la configuración del entorno la primera vez que se pide
+    if name == "app":
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Handle/serialize errors like a JSON object
 
 
-@app.errorhandler(APIException)
+@api.app_errorhandler(APIException)
 def handle_invalid_usage(error):
     return jsonify(error.to_dict()), error.status_code
 
 # generate sitemap with all your endpoints
 
 
-@app.route('/')
+@api.route('/')
 def sitemap():
-    return generate_sitemap(app)
+    return generate_sitemap(current_app)
+
+
+@api.route('/health/db', methods=['GET'])
+@limit(None)
+def health_db():
+    try:
+        latency_ms = ping(db.engine)
+    except SQLAlchemyError as error:
+        return jsonify({"status": "error", "error": type(error).__name__,
+                        "pool": pool_status(db.engine)}), 503
+    return jsonify({"status": "ok", "ping_ms": latency_ms,
+                    "pool": pool_status(db.engine),
+                    "replicas": replicas.status(),
+                    "group_commit": group_commit.stats(),
+                    "rate_limit": limiter.stats()}), 200
+
+
+@api.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(cache.stats()), 200
+
+
+def bulk_create(model, items, build_values, after_insert=None):
+    # Valida todos los elementos antes de escribir nada; si alguno falla
+    # no se inserta ninguno. Si todos son válidos se insertan con un único
+    # INSERT ... RETURNING (executemany) en una sola transacción.
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Se esperaba una lista de elementos"}), 400
+    if len(items) > MAX_BULK_SIZE:
+        return jsonify({"error": f"Máximo {MAX_BULK_SIZE} elementos por petición"}), 400
+
+    rows = []
+    errors = {}
+    for index, data in enumerate(items):
+        values, error = build_values(data)
+        if error:
+            errors[index] = error
+        else:
+            rows.append(values)
+
+    if errors:
+        results = []
+        for index in range(len(items)):
+            if index in errors:
+                message, status_code = errors[index]
+                results.append({"index": index, "ok": False,
+                                "status": status_code, "error": message})
+            else:
+                results.append({"index": index, "ok": True})
+        return jsonify({"results": results}), 400
+
+    try:
+        created = insert_returning(model, rows)
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"error": "Algunos elementos ya existen"}), 409
+    # serializamos antes del commit para no recargar cada fila expirada; el
+    # índice de nombres y el de búsqueda se alimentan de esos mismos dicts
+    items = [item.serialize() for item in created]
+    results = [
+        {"index": index, "ok": True, "status": 201, "data": item}
+        for index, item in enumerate(items)
+    ]
+    if after_insert:
+        after_insert(rows)
+    db.session.commit()
+    for item in items:
+        resolver.remember(model, item)
+        search_index.add(model, item)
 
+    return jsonify({"results": results}), 201
 
-@app.route('/users', methods=['GET'])
-def get_users():
-    users = User.query.all()
-    return jsonify([user.serialize() for user in users]), 200
 
-
-@app.route('/users', methods=['POST'])
+@api.route('/users', methods=['GET'])
+@conditional(User)
+def get_users():
+    order = parse_sort(User)
+    fields, include, extra = parse_sparse(User, order)
+    query = apply_filters(User.rows(fields, extra), User)
+    serialize = User.row_serializer(fields, extra)
+    if wants_stream():
+        return stream_query(ordered(query, User.id, order), serialize)
+    users, next_cursor = paginate(query, User.id, order)
+    return page_response(embed(User, include, users,
+                               [serialize(user) for user in users]), next_cursor)
+
+
+@api.route('/users', methods=['POST'])
 def new_user():
     data = request.get_json()
 
@@ -65,302 +233,520 @@ def new_user():
     )
     db.session.add(new_user)
     db.session.commit()
+    item = new_user.serialize()
+    resolver.remember(User, item)
 
-    return jsonify(new_user.serialize()), 201
+    return jsonify(item), 201
 
 # gestion de favoritos
 
 
-@app.route('/favorites', methods=['GET'])
+@api.route('/favorites', methods=['GET'])
+@expensive
+@conditional(Favorite, User, Planet, Vehicle, People)
 def get_all_favorites():
-    favorites = Favorite.query.all()
-
-    if not favorites:
+    order = parse_sort(Favorite)
+    fields, include, extra = parse_sparse(
+        Favorite, order, Favorite.serialize_columns + Favorite.name_fields)
+    query = apply_filters(Favorite.with_names(fields, extra), Favorite)
+    serialize = Favorite.names_serializer(fields, extra)
+    if wants_stream():
+        return stream_query(ordered(query, Favorite.id, order), serialize)
+    favorites, next_cursor = paginate(query, Favorite.id, order)
+
+    if not favorites and "cursor" not in request.args and not parse_filters(Favorite):
         return jsonify({"message": "No hay favoritos registrados"}), 200
 
-    result = []
-    for fav in favorites:
-        favorite_data = fav.serialize()
-
-        user = User.query.get(fav.user_id)
-        favorite_data["user_name"] = user.first_name if user else None
-        favorite_data["user_email"] = user.email if user else None
+    return page_response(embed(Favorite, include, favorites,
+                               [serialize(fav) for fav in favorites]), next_cursor)
 
-        if fav.planet_id:
-            planet = Planet.query.get(fav.planet_id)
-            favorite_data["planet_name"] = planet.planet_name if planet else None
 
-        if fav.vehicles_id:
-            vehicle = Vehicle.query.get(fav.vehicles_id)
-            favorite_data["vehicle_model"] = vehicle.model if vehicle else None
+@api.route('/users/<int:user_id>/favorites', methods=['GET'])
+@conditional(Favorite, User, Planet, Vehicle, People)
+def get_user_favorites(user_id):
+    # Favoritos ya enriquecidos desde la tabla user_favorites
+    user_name, favorites = user_favorites(user_id)
+    if user_name is None:
+        return jsonify({"error": "Usuario no encontrado"}), 404
 
-        if fav.characters_id:
-            character = People.query.get(fav.characters_id)
-            favorite_data["character_name"] = character.name if character else None
+    if not favorites:
+        return jsonify({"message": f"{user_name} no tiene favoritos"}), 200
 
-        result.append(favorite_data)
+    return jsonify(favorites), 200
 
-    return jsonify(result), 200
 
+@api.route('/users/<int:user_id>/home', methods=['GET'])
+@expensive
+@conditional(User, Planet, People, Vehicle, Favorite)
+def get_user_home(user_id):
+    # planetas, personajes, vehículos y favoritos en paralelo, en una sola
+    # respuesta; ?resources=planets,favorites pide solo algunos
+    limit, _ = page_args()
+    names = [name for name in request.args.get("resources", "").split(",") if name]
+    unknown = sorted(set(names) - set(RESOURCES))
+    if unknown:
+        return jsonify({"error": f"Recursos desconocidos: {', '.join(unknown)}"}), 400
 
-@app.route('/users/<int:user_id>/favorites', methods=['GET'])
-def get_user_favorites(user_id):
-    # Buscar el usuario
-    user = User.query.get(user_id)
-    if not user:
+    data = aggregate(user_id, limit, names)
+    if data is None:
         return jsonify({"error": "Usuario no encontrado"}), 404
+    return jsonify(data), 200
 
-    # Obtener los favoritos del usuario
-    favorites = Favorite.query.filter_by(user_id=user_id).all()
 
-    if not favorites:
-        return jsonify({"message": f"{user.first_name} no tiene favoritos"}), 200
+def favorite_user(data):
+    # id del usuario de un favorito a partir de user_id, user_name o
+    # user_email. Devuelve (user_id, None) o (None, (mensaje, status))
+    if "user_id" in data:
+        return data["user_id"], None
+    if "user_name" in data:
+        user_id = resolver.resolve("user_name", data["user_name"])
+        if not user_id:
+            return None, (f"El usuario '{data['user_name']}' no existe", 404)
+        return user_id, None
+    if "user_email" in data:
+        user_id = resolver.resolve("user_email", data["user_email"])
+        if not user_id:
+            return None, (f"El usuario con email '{data['user_email']}' no existe", 404)
+        return user_id, None
+    return None, ("Debe proporcionar user_id, user_name o user_email", 400)
+
+
+def favorite_targets(data):
+    # {columna: id} del planeta, vehículo y/o personaje de un favorito.
+    # Devuelve (objetivos, None) o (None, (mensaje, status))
+    targets = {}
+    if "planet_name" in data:
+        planet_id = resolver.resolve("planet_name", data["planet_name"])
+        if not planet_id:
+            return None, (f"El planeta '{data['planet_name']}' no existe", 404)
+        targets["planet_id"] = planet_id
 
-    result = []
-    for fav in favorites:
-        favorite_data = fav.serialize()
+    if "vehicle_model" in data:
+        vehicle_id = resolver.resolve("vehicle_model", data["vehicle_model"])
+        if not vehicle_id:
+            return None, (f"El vehículo '{data['vehicle_model']}' no existe", 404)
+        targets["vehicles_id"] = vehicle_id
 
-        # Agregar información del usuario dueño del favorito
-        favorite_data["user_name"] = user.first_name
-        favorite_data["user_email"] = user.email
+    if "character_name" in data:
+        character_id = resolver.resolve("character_name", data["character_name"])
+        if not character_id:
+            return None, (f"El personaje '{data['character_name']}' no existe", 404)
+        targets["characters_id"] = character_id
 
-        # Obtener nombres adicionales si existen
-        if fav.planet_id:
-            planet = Planet.query.get(fav.planet_id)
-            favorite_data["planet_name"] = planet.planet_name if planet else None
+    if not targets:
+        return None, ("Debe proporcionar un nombre válido de planeta, vehículo o personaje", 400)
+    return targets, None
 
-        if fav.vehicles_id:
-            vehicle = Vehicle.query.get(fav.vehicles_id)
-            favorite_data["vehicle_model"] = vehicle.model if vehicle else None
 
-        if fav.characters_id:
-            character = People.query.get(fav.characters_id)
-            favorite_data["character_name"] = character.name if character else None
+def favorite_values(data):
+    # Resuelve los nombres del favorito a ids con el índice en memoria.
+    # Devuelve (valores, None) o (None, (mensaje, status))
+    if not data:
+        return None, ("Debe proporcionar user_id, user_name o user_email", 400)
 
-        result.append(favorite_data)
+    user_id, error = favorite_user(data)
+    if error:
+        return None, error
+    targets, error = favorite_targets(data)
+    if error:
+        return None, error
 
-    return jsonify(result), 200
+    return {
+        "user_id": user_id,
+        "planet_id": targets.get("planet_id"),
+        "vehicles_id": targets.get("vehicles_id"),
+        "characters_id": targets.get("characters_id"),
+    }, None
 
 
-@app.route('/favorites', methods=['POST'])
+@api.route('/favorites', methods=['POST'])
 def add_favorite():
-    data = request.get_json()
+    values, error = favorite_values(request.get_json())
+    if error:
+        message, status_code = error
+        return jsonify({"error": message}), status_code
+
+    if group_commit.enabled:
+        # se confirma junto con las demás altas concurrentes
+        try:
+            status_code, favorite = group_commit.submit(values)
+        except IntegrityError:
+            return jsonify({"error": "No se pudo guardar el favorito"}), 409
+        return jsonify(favorite), status_code
+
+    # Crear el nuevo favorito; si ya existe no se duplica
+    new_id = db.session.execute(
+        insert_ignore(Favorite).values(**values).returning(Favorite.id)).scalar()
+    if new_id is None:
+        db.session.rollback()
+        targets = [getattr(Favorite, column) == values[column]
+                   for column in ("planet_id", "vehicles_id", "characters_id")
+                   if values[column]]
+        existing = Favorite.query.filter(
+            Favorite.user_id == values["user_id"], or_(*targets)).order_by(Favorite.id).first()
+        return jsonify(existing.serialize()), 200
+
+    bump_counts([values])
+    refresh_user_favorites([values["user_id"]])
+    db.session.commit()
 
-    user_id = None
-    if "user_id" in data:
-        user_id = data["user_id"]
-    elif "user_name" in data:
-        user = User.query.filter_by(first_name=data["first_name"]).first()
-        if not user:
-            return jsonify({"error": f"El usuario '{data['first_name']}' no existe"}), 404
-        user_id = user.id
-    elif "user_email" in data:
-        user = User.query.filter_by(email=data["user_email"]).first()
-        if not user:
-            return jsonify({"error": f"El usuario con email '{data['user_email']}' no existe"}), 404
-        user_id = user.id
-    else:
-        return jsonify({"error": "Debe proporcionar user_id, user_name o user_email"}), 400
+    return jsonify({"id": new_id, **values}), 201
 
-    planet_id = None
-    if "planet_name" in data:
-        planet = Planet.query.filter_by(
-            planet_name=data["planet_name"]).first()
-        if not planet:
-            return jsonify({"error": f"El planeta '{data['planet_name']}' no existe"}), 404
-        planet_id = planet.id
 
-    vehicle_id = None
-    if "vehicle_model" in data:
-        vehicle = Vehicle.query.filter_by(model=data["vehicle_model"]).first()
-        if not vehicle:
-            return jsonify({"error": f"El vehículo '{data['vehicle_model']}' no existe"}), 404
-        vehicle_id = vehicle.id
+@api.route('/favorites/bulk', methods=['POST'])
+@expensive
+def add_favorites_bulk():
+    return bulk_create(Favorite, request.get_json(), favorite_values,
+                       after_insert=favorites_inserted)
 
-    character_id = None
-    if "character_name" in data:
-        character = People.query.filter_by(name=data["character_name"]).first()
-        if not character:
-            return jsonify({"error": f"El personaje '{data['character_name']}' no existe"}), 404
-        character_id = character.id
-
-    if not any([planet_id, vehicle_id, character_id]):
-        return jsonify({"error": "Debe proporcionar un nombre válido de planeta, vehículo o personaje"}), 400
-
-    # Crear el nuevo favorito
-    new_favorite = Favorite(
-        user_id=user_id,
-        planet_id=planet_id,
-        vehicles_id=vehicle_id,
-        characters_id=character_id
-    )
 
-    db.session.add(new_favorite)
+def favorites_inserted(rows):
+    bump_counts(rows)
+    refresh_user_favorites({row["user_id"] for row in rows})
+
+
+@api.route('/favorites/batch', methods=['POST'])
+@expensive
+def batch_favorites():
+    # Aplica una lista de altas y bajas de favoritos de un usuario en una
+    # sola transacción: un INSERT ... ON CONFLICT DO NOTHING para las altas
+    # y un DELETE para las bajas. Devuelve el estado final.
+    data = request.get_json()
+    if not data or not isinstance(data.get("operations"), list):
+        return jsonify({"error": "Debe proporcionar una lista de operaciones"}), 400
+
+    user_id, error = favorite_user(data)
+    if error:
+        message, status_code = error
+        return jsonify({"error": message}), status_code
+    # aquí se devuelve el estado final: el usuario tiene que existir
+    if "user_id" in data and db.session.get(User, user_id) is None:
+        return jsonify({"error": "Usuario no encontrado"}), 404
+
+    # la última operación sobre cada objetivo es la que cuenta
+    desired = {}
+    errors = []
+    for index, operation in enumerate(data["operations"]):
+        if not isinstance(operation, dict) or operation.get("op") not in ("add", "remove"):
+            errors.append({"index": index, "status": 400,
+                           "error": "La operación debe ser 'add' o 'remove'"})
+            continue
+        targets, error = favorite_targets(operation)
+        if error:
+            message, status_code = error
+            errors.append({"index": index, "status": status_code, "error": message})
+            continue
+        for target in targets.items():
+            desired[target] = operation["op"]
+
+    if errors:
+        return jsonify({"errors": errors}), 400
+
+    adds = [{"user_id": user_id, "planet_id": None, "vehicles_id": None,
+             "characters_id": None, column: target_id}
+            for (column, target_id), op in desired.items() if op == "add"]
+    removes = {}
+    for (column, target_id), op in desired.items():
+        if op == "remove":
+            removes.setdefault(column, []).append(target_id)
+
+    # RETURNING solo devuelve lo que de verdad se insertó o borró, para
+    # ajustar los contadores
+    added = removed = []
+    if adds:
+        added = db.session.execute(
+            insert_ignore(Favorite).returning(*Favorite.projection()), adds).mappings().all()
+    if removes:
+        removed = db.session.execute(delete(Favorite).where(
+            Favorite.user_id == user_id,
+            or_(*(getattr(Favorite, column).in_(ids) for column, ids in removes.items())))
+            .returning(*Favorite.projection())).mappings().all()
+    bump_counts(added)
+    bump_counts(removed, -1)
+    entry = refresh_user_favorites([user_id])[user_id]
     db.session.commit()
 
-    return jsonify(new_favorite.serialize()), 201
+    return jsonify(entry["favorites"]), 200
 
 
-@app.route('/favorites', methods=['DELETE'])
+@api.route('/favorites', methods=['DELETE'])
 def delete_favorite():
     data = request.get_json()
 
     if not data:
         return jsonify({"error": "Il corpo della richiesta è vuoto"}), 400
 
-    user = User.query.filter_by(first_name=data["first_name"]).first()
-    if not user:
+    user_id = resolver.resolve("user_name", data["first_name"])
+    if not user_id:
         return jsonify({"error": f"Utente '{data['first_name']}' non trovato"}), 404
 
-    user_id = user.id
-
-    favorite = None
     if "planet_name" in data:
-        planet = Planet.query.filter_by(
-            planet_name=data["planet_name"]).first()
-        if not planet:
+        planet_id = resolver.resolve("planet_name", data["planet_name"])
+        if not planet_id:
             return jsonify({"error": f"Pianeta '{data['planet_name']}' non trovato"}), 404
-        favorite = Favorite.query.filter_by(
-            user_id=user_id, planet_id=planet.id).first()
+        target = Favorite.planet_id == planet_id
 
     elif "vehicle_model" in data:
-        vehicle = Vehicle.query.filter_by(model=data["vehicle_model"]).first()
-        if not vehicle:
+        vehicle_id = resolver.resolve("vehicle_model", data["vehicle_model"])
+        if not vehicle_id:
             return jsonify({"error": f"Veicolo '{data['vehicle_model']}' non trovato"}), 404
-        favorite = Favorite.query.filter_by(
-            user_id=user_id, vehicles_id=vehicle.id).first()
+        target = Favorite.vehicles_id == vehicle_id
 
     elif "character_name" in data:
-        character = People.query.filter_by(name=data["character_name"]).first()
-        if not character:
+        character_id = resolver.resolve("character_name", data["character_name"])
+        if not character_id:
             return jsonify({"error": f"Personaggio '{data['character_name']}' non trovato"}), 404
-        favorite = Favorite.query.filter_by(
-            user_id=user_id, characters_id=character.id).first()
+        target = Favorite.characters_id == character_id
 
     else:
         return jsonify({"error": "Devi specificare planet_name, vehicle_model o character_name"}), 400
 
-    if not favorite:
-        return jsonify({"error": "Il preferito non esiste per questo utente"}), 404
-
-    db.session.delete(favorite)
+    # un único DELETE ... WHERE, sin leer antes la fila
+    deleted = db.session.execute(
+        delete(Favorite).where(Favorite.user_id == user_id, target)
+        .returning(*Favorite.projection())).mappings().all()
+    if deleted:
+        bump_counts(deleted, -1)
+        refresh_user_favorites([user_id])
     db.session.commit()
 
+    if not deleted:
+        return jsonify({"error": "Il preferito non esiste per questo utente"}), 404
+
     return jsonify({"message": "Preferito eliminato correttamente"}), 200
 
 
-# endpoint planet
+# estadísticas
 
-@app.route('/planets', methods=['GET'])
-def gate_all_planets():
-    planets = Planet.query.all()
-    return jsonify([planet.serialize() for planet in planets]), 200
+
+@api.route('/stats/top/<entity>', methods=['GET'])
+def stats_top(entity):
+    # planetas, vehículos, personajes o usuarios con más favoritos
+    if entity not in LEADERBOARDS:
+        return jsonify({"error": f"Estadística desconocida: {entity}"}), 404
+    limit = min(max(request.args.get("limit", 10, type=int), 1), 100)
+    return jsonify(top(entity, limit)), 200
+
+
+@api.route('/stats/users', methods=['GET'])
+def stats_users():
+    users, next_cursor = paginate(user_counts(), User.id)
+    return page_response([{"user_id": user.id, "user_name": user.first_name,
+                           "favorites": user.favorites} for user in users], next_cursor)
 
 
-@app.route('/planet/<int:id>', methods=['GET'])
+# búsqueda
+
+
+@api.route('/search', methods=['GET'])
+@expensive
+def search_catalog():
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({"error": "Falta el parámetro q"}), 400
+    limit = min(request.args.get("limit", 20, type=int), 100)
+    return jsonify(search(query, max(limit, 1))), 200
+
+
+# endpoint planet
+
+@api.route('/planets', methods=['GET'])
+@conditional(Planet)
+@cached(Planet)
+def gate_all_planets():
+    order = parse_sort(Planet)
+    fields, include, extra = parse_sparse(Planet, order)
+    query = apply_filters(Planet.rows(fields, extra), Planet)
+    serialize = Planet.row_serializer(fields, extra)
+    if wants_stream():
+        return stream_query(ordered(query, Planet.id, order), serialize)
+    planets, next_cursor = paginate(query, Planet.id, order)
+    return page_response(embed(Planet, include, planets,
+                               [serialize(planet) for planet in planets]), next_cursor)
+
+
+@api.route('/planet/<int:id>', methods=['GET'])
+@conditional(Planet)
+@cached(Planet)
 def get_planet(id):
-    planet = Planet.query.get(id)
+    fields, include, extra = parse_sparse(Planet)
+    planet = Planet.rows(fields, extra).filter(Planet.id == id).first()
     if planet is None:
         return jsonify({
             "error": "Planeta no encontrado"
         }), 404
-    return jsonify(planet.serialize())
-
+    item = Planet.row_serializer(fields, extra)(planet)
+    return jsonify(embed(Planet, include, [planet], [item])[0])
 
-@app.route('/planets', methods=['POST'])
-def create_planet():
-    data = request.get_json()
 
+def planet_values(data):
     if not data or "planet_name" not in data or "periodo_de_rotacion" not in data or "climate" not in data or "poblation" not in data:
-        return jsonify({"error": "Faltan datos obligatorios"}), 400
+        return None, ("Faltan datos obligatorios", 400)
 
-    new_planet = Planet(
-        planet_name=data["planet_name"],
-        periodo_de_rotacion=data["periodo_de_rotacion"],
-        climate=data["climate"],
-        poblation=data["poblation"]
-    )
+    return {
+        "planet_name": data["planet_name"],
+        "periodo_de_rotacion": data["periodo_de_rotacion"],
+        "climate": data["climate"],
+        "poblation": data["poblation"],
+    }, None
+
+
+@api.route('/planets', methods=['POST'])
+def create_planet():
+    values, error = planet_values(request.get_json())
+    if error:
+        message, status_code = error
+        return jsonify({"error": message}), status_code
+
+    new_planet = Planet(**values)
 
     db.session.add(new_planet)
     db.session.commit()
+    item = new_planet.serialize()
+    resolver.remember(Planet, item)
+    search_index.add(Planet, item)
+
+    return jsonify(item), 201
+
 
-    return jsonify(new_planet.serialize()), 201
+@api.route('/planets/bulk', methods=['POST'])
+@expensive
+def create_planets_bulk():
+    return bulk_create(Planet, request.get_json(), planet_values)
 
 # endpoint people
 
 
-@app.route('/people', methods=['GET'])
+@api.route('/people', methods=['GET'])
+@conditional(People)
+@cached(People)
 def get_people():
-    peoples = People.query.all()
-    return jsonify([peoples.serialize() for peoples in peoples]), 200
+    order = parse_sort(People)
+    fields, include, extra = parse_sparse(People, order)
+    query = apply_filters(People.rows(fields, extra), People)
+    serialize = People.row_serializer(fields, extra)
+    if wants_stream():
+        return stream_query(ordered(query, People.id, order), serialize)
+    peoples, next_cursor = paginate(query, People.id, order)
+    return page_response(embed(People, include, peoples,
+                               [serialize(people) for people in peoples]), next_cursor)
+
+
+def people_values(data):
+    if not data or "name" not in data or "age" not in data or "hair_color" not in data or "birth_year" not in data:
+        return None, ("faltan datos estos son los que has enviado", 400)
 
+    return {
+        "name": data['name'],
+        "age": data['age'],
+        "hair_color": data['hair_color'],
+        "birth_year": data['birth_year'],
+    }, None
 
-@app.route('/people', methods=['POST'])
-def create_people():
-    data = request.get_json()
 
-    if not data or "name" not in data or "age" not in data or "hair_color" not in data or "birth_year" not in data:
-        return jsonify({"error": f"faltan datos estos son los que has enviado"}), 400
+@api.route('/people', methods=['POST'])
+def create_people():
+    values, error = people_values(request.get_json())
+    if error:
+        message, status_code = error
+        return jsonify({"error": message}), status_code
 
-    new_people = People(
-        name=data['name'],
-        age=data['age'],
-        hair_color=data['hair_color'],
-        birth_year=data['birth_year']
-    )
+    new_people = People(**values)
 
     db.session.add(new_people)
     db.session.commit()
+    item = new_people.serialize()
+    resolver.remember(People, item)
+    search_index.add(People, item)
+
+    return jsonify(item), 201
 
-    return jsonify(new_people.serialize()), 201
 
+@api.route('/people/bulk', methods=['POST'])
+@expensive
+def create_people_bulk():
+    return bulk_create(People, request.get_json(), people_values)
 
-@app.route('/people/<int:id>', methods=['GET'])
+
+@api.route('/people/<int:id>', methods=['GET'])
+@conditional(People)
+@cached(People)
 def get_person(id):
-    person = People.query.get(id)
+    fields, include, extra = parse_sparse(People)
+    person = People.rows(fields, extra).filter(People.id == id).first()
     if person is None:
         return jsonify({
             "error": "Usuario no encontrado"
         }), 404
-    return jsonify(person.serialize())
+    item = People.row_serializer(fields, extra)(person)
+    return jsonify(embed(People, include, [person], [item])[0])
 
 # endpoint Vehicles
 
 
-@app.route('/vehicles', methods=['GET'])
+@api.route('/vehicles', methods=['GET'])
+@conditional(Vehicle)
+@cached(Vehicle)
 def gate_all_vehicles():
-    vehicles = Vehicle.query.all()
-    return jsonify([vehicles.serialize() for vehicle in vehicles]), 200
+    order = parse_sort(Vehicle)
+    fields, include, extra = parse_sparse(Vehicle, order)
+    query = apply_filters(Vehicle.rows(fields, extra), Vehicle)
+    serialize = Vehicle.row_serializer(fields, extra)
+    if wants_stream():
+        return stream_query(ordered(query, Vehicle.id, order), serialize)
+    vehicles, next_cursor = paginate(query, Vehicle.id, order)
+    return page_response(embed(Vehicle, include, vehicles,
+                               [serialize(vehicle) for vehicle in vehicles]), next_cursor)
+
+
+def vehicle_values(data):
+    if not data or "model" not in data or "speed" not in data or "pilot" not in data or "length" not in data:
+        return None, ("Faltan datos obligatorios", 400)
 
+    return {
+        "model": data["model"],
+        "speed": data["speed"],
+        "pilot": data["pilot"],
+        "length": data["length"],
+    }, None
 
-@app.route('/vehicles', methods=['POST'])
-def create_vehicle():
-    data = request.get_json()
 
-    if not data or "model" not in data or "speed" not in data or "pilot" not in data or "length" not in data:
-        return jsonify({"error": "Faltan datos obligatorios"}), 400
+@api.route('/vehicles', methods=['POST'])
+def create_vehicle():
+    values, error = vehicle_values(request.get_json())
+    if error:
+        message, status_code = error
+        return jsonify({"error": message}), status_code
 
-    new_vehicle = Vehicle(
-        model=data["model"],
-        speed=data["speed"],
-        pilot=data["pilot"],
-        length=data["length"]
-    )
+    new_vehicle = Vehicle(**values)
 
     db.session.add(new_vehicle)
     db.session.commit()
+    item = new_vehicle.serialize()
+    resolver.remember(Vehicle, item)
+    search_index.add(Vehicle, item)
+
+    return jsonify(item), 201
+
 
-    return jsonify(new_vehicle.serialize()), 201
+@api.route('/vehicles/bulk', methods=['POST'])
+@expensive
+def create_vehicles_bulk():
+    return bulk_create(Vehicle, request.get_json(), vehicle_values)
 
 
-@app.route('/vehicle/<int:id>', methods=['GET'])
+@api.route('/vehicle/<int:id>', methods=['GET'])
+@conditional(Vehicle)
+@cached(Vehicle)
 def get_vehicle(id):
-    vehicle = Vehicle.query.get(id)
+    fields, include, extra = parse_sparse(Vehicle)
+    vehicle = Vehicle.rows(fields, extra).filter(Vehicle.id == id).first()
     if vehicle is None:
         return jsonify({
             "error": "Veiculo no encontrado"
         }), 404
-    return jsonify(vehicle.serialize())
+    item = Vehicle.row_serializer(fields, extra)(vehicle)
+    return jsonify(embed(Vehicle, include, [vehicle], [item])[0])
 
 # endpoint user
 
@@ -368,4 +754,4 @@ def get_vehicle(id):
 # this only runs if `$ python src/app.py` is executed
 if __name__ == '__main__':
     PORT = int(os.environ.get('PORT', 3000))
-    app.run(host='0.0.0.0', port=PORT, debug=False)
+    create_app().run(host='0.0.0.0', port=PORT, debug=False)
@@ -0,0 +1,317 @@
+# Entrada ASGI alternativa a wsgi.py. Las rutas de lectura se sirven con
+# una AsyncSession de SQLAlchemy y el resto se delega en la app de Flask.
+#
+#   uvicorn asgi:app --app-dir src
+#
+# Necesita asgiref y un driver async: asyncpg (Postgres) o aiosqlite.
+#
+# Cada ruta rápida responde igual que su vista de Flask: mismo ETag y 304
+# (etag.conditional), misma cache y con las mismas claves (cache.cached,
+# así ambas comparten entradas), misma compresión negociada, mismo límite
+# de peticiones y las mismas réplicas de lectura (replicas.py, cada réplica
+# con su engine async). Lo que no se puede servir así (?stream, ?include,
+# Accept: application/x-ndjson) sigue en Flask.
+
+import os
+import asyncio
+from urllib.parse import parse_qsl, urlencode
+from asgiref.wsgi import WsgiToAsgi
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import parse_accept_header, parse_cookie, parse_etags, quote_etag
+from werkzeug.routing import RoutingException
+from app import app as flask_app
+from sqlalchemy import select
+from models import User, Planet, People, Vehicle, Favorite, UserFavorites
+from pagination import page_args, keyset, split_page
+from filters import apply_filters, parse_filters, parse_sort
+from fields import parse_fields
+from pool_metrics import engine_options
+from utils import APIException
+from ratelimit import client_key
+from etag import etag
+from cache import cache_key
+from compression import negotiate, compress, COMPRESS_MIN_SIZE
+from replicas import router as replicas, pinned_to_primary, PRIMARY_COOKIE
+from versions import versions_query
+
+
+def async_database_url(url):
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    return url
+
+
+def create_engine_for(url):
+    return create_async_engine(url, **engine_options(url, timed=False))
+
+
+database_url = os.getenv("ASYNC_DATABASE_URL") or async_database_url(
+    flask_app.config['SQLALCHEMY_DATABASE_URI'])
+engine = create_engine_for(database_url)
+# engine síncrono de cada réplica -> su equivalente async
+replica_engines = {
+    replica: create_engine_for(async_database_url(replica.url.render_as_string(hide_password=False)))
+    for replica in replicas.engines}
+Session = async_sessionmaker(engine, expire_on_commit=False)
+wsgi = WsgiToAsgi(flask_app)
+urls = flask_app.url_map.bind("localhost")
+# fuera de un contexto de Flask: el estado de la app se toma directamente
+limiter = flask_app.extensions["limiter"]
+cache = flask_app.extensions["cache"]
+
+
+async def fetch_page(session, model, args, allowed=None):
+    limit, after = page_args(args)
+    order = parse_sort(model, args)
+    fields = parse_fields(model, allowed, args)
+    extra = tuple(column.key for column, _ in order)
+    if model is Favorite:
+        query = Favorite.select_with_names(fields, extra)
+        serialize = Favorite.names_serializer(fields, extra)
+    else:
+        query = model.select_rows(fields, extra)
+        serialize = model.row_serializer(fields, extra)
+    query = keyset(apply_filters(query, model, args), model.id, limit, after, order)
+    rows, next_cursor = split_page((await session.execute(query)).all(), limit, order)
+    return 200, [serialize(row) for row in rows], next_cursor
+
+
+async def fetch_one(session, model, args, id, error):
+    fields = parse_fields(model, args=args)
+    row = (await session.execute(
+        model.select_rows(fields).where(model.id == id))).first()
+    if row is None:
+        return 404, {"error": error}, None
+    return 200, model.row_serializer(fields)(row), None
+
+
+async def get_users(session, args):
+    return await fetch_page(session, User, args)
+
+
+async def get_all_favorites(session, args):
+    status, favorites, next_cursor = await fetch_page(
+        session, Favorite, args, Favorite.serialize_columns + Favorite.name_fields)
+    if not favorites and "cursor" not in args and not parse_filters(Favorite, args):
+        return 200, {"message": "No hay favoritos registrados"}, None
+    return status, favorites, next_cursor
+
+
+async def get_user_favorites(session, args, user_id):
+    entry = (await session.execute(
+        select(UserFavorites.user_name, UserFavorites.favorites)
+        .where(UserFavorites.user_id == user_id))).first()
+    if entry is not None:
+        if not entry.favorites:
+            return 200, {"message": f"{entry.user_name} no tiene favoritos"}, None
+        return 200, entry.favorites, None
+
+    # aún no materializado: lo calculamos al vuelo
+    user = (await session.execute(User.select_rows().where(User.id == user_id))).first()
+    if user is None:
+        return 404, {"error": "Usuario no encontrado"}, None
+
+    rows = (await session.execute(
+        Favorite.select_with_names().where(Favorite.user_id == user_id).order_by(Favorite.id))).all()
+    if not rows:
+        return 200, {"message": f"{user.first_name} no tiene favoritos"}, None
+    return 200, [Favorite.serialize_with_names(row) for row in rows], None
+
+
+async def get_planets(session, args):
+    return await fetch_page(session, Planet, args)
+
+
+async def get_planet(session, args, id):
+    return await fetch_one(session, Planet, args, id, "Planeta no encontrado")
+
+
+async def get_people(session, args):
+    return await fetch_page(session, People, args)
+
+
+async def get_person(session, args, id):
+    return await fetch_one(session, People, args, id, "Usuario no encontrado")
+
+
+async def get_vehicles(session, args):
+    return await fetch_page(session, Vehicle, args)
+
+
+async def get_vehicle(session, args, id):
+    return await fetch_one(session, Vehicle, args, id, "Veiculo no encontrado")
+
+
+# endpoint de Flask -> handler async
+HANDLERS = {
+    "api.get_users": get_users,
+    "api.get_all_favorites": get_all_favorites,
+    "api.get_user_favorites": get_user_favorites,
+    "api.gate_all_planets": get_planets,
+    "api.get_planet": get_planet,
+    "api.get_people": get_people,
+    "api.get_person": get_person,
+    "api.gate_all_vehicles": get_vehicles,
+    "api.get_vehicle": get_vehicle,
+}
+
+
+def match(scope, headers):
+    # (endpoint, handler, parámetros de la URL) o None si va a Flask
+    if scope["method"] != "GET":
+        return None
+    # el streaming sigue en la app de Flask
+    if b"ndjson" in headers.get(b"accept", b""):
+        return None
+    try:
+        endpoint, params = urls.match(scope["path"], "GET")
+    except (HTTPException, RoutingException):
+        return None
+    handler = HANDLERS.get(endpoint)
+    return (endpoint, handler, params) if handler else None
+
+
+def render(scope, body, next_cursor):
+    # cuerpo y cabeceras como los de page_response()/jsonify() en Flask
+    payload = (flask_app.json.dumps(body, separators=(",", ":")) + "\n").encode()
+    headers = [("Content-Type", "application/json"), ("Content-Length", str(len(payload)))]
+    if next_cursor is not None:
+        args = dict(parse_qsl(scope["query_string"].decode()))
+        args["cursor"] = next_cursor
+        host = dict(scope["headers"]).get(b"host", b"localhost").decode()
+        url = f"{scope['scheme']}://{host}{scope.get('root_path', '')}{scope['path']}?{urlencode(args)}"
+        headers.append(("X-Next-Cursor", next_cursor))
+        headers.append(("Link", f'<{url}>; rel="next"'))
+    return payload, headers
+
+
+def compressed(payload, headers, encoding):
+    # lo mismo que compression.compress_response() para una respuesta JSON
+    headers = [*headers, ("Vary", "Accept-Encoding")]
+    if encoding is None or len(payload) < COMPRESS_MIN_SIZE:
+        return payload, headers
+    payload = compress(payload, encoding)
+    headers = [(name, str(len(payload)) if name == "Content-Length" else value)
+               for name, value in headers]
+    return payload, headers + [("Content-Encoding", encoding)]
+
+
+async def send_response(send, status, payload, headers):
+    headers = [(name.lower().encode(), value.encode()) for name, value in headers]
+    headers.append((b"access-control-allow-origin", b"*"))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": payload})
+
+
+async def send_json(scope, send, status, body, next_cursor=None, extra_headers=()):
+    payload, headers = render(scope, body, next_cursor)
+    await send_response(send, status, payload, [*headers, ("Vary", "Accept-Encoding"),
+                                                *extra_headers])
+
+
+async def read_versions(session, models):
+    # versions.table_versions() con la sesión async
+    names = [model.__table__.name for model in models]
+    found = dict((await session.execute(versions_query(names))).all())
+    return {name: found.get(name, 0) for name in names}
+
+
+async def read_engine(headers):
+    # réplica para esta lectura con las mismas reglas que replicas.py
+    if not replica_engines:
+        return engine
+    cookies = parse_cookie(headers.get(b"cookie", b"").decode())
+    if pinned_to_primary(headers.get(b"x-read-primary", b"").decode(), cookies.get(PRIMARY_COOKIE)):
+        return engine
+    # choose() puede medir el retraso de una réplica: fuera del event loop
+    replica = await asyncio.to_thread(replicas.choose)
+    return replica_engines.get(replica, engine)
+
+
+def rate_limited(scope, endpoint):
+    rule = limiter.rule(flask_app.view_functions[endpoint])
+    if rule is None:
+        return None
+    forwarded_for = dict(scope["headers"]).get(b"x-forwarded-for", b"").decode()
+    client = client_key(forwarded_for, (scope.get("client") or [None])[0], limiter.trusted_hops)
+    return limiter.check(client, endpoint, rule)
+
+
+async def respond(scope, headers, session, view, handler, args, params):
+    # (estado, cuerpo, cabeceras) pasando por las mismas capas que la vista:
+    # conditional() -> cached() -> vista -> compresión
+    models = getattr(view, "conditional", ())
+    cached_model = getattr(view, "cached", None)
+    full_path = f"{scope['path']}?{scope['query_string'].decode()}"
+    encoding = negotiate(parse_accept_header(headers.get(b"accept-encoding", b"").decode()))
+    versions = await read_versions(session, {*models, cached_model} - {None})
+
+    tag = None
+    if models:
+        tag = etag(full_path, headers.get(b"accept", b"").decode(),
+                   {model.__table__.name: versions[model.__table__.name] for model in models})
+        if parse_etags(headers.get(b"if-none-match", b"").decode()).contains_weak(tag):
+            return 304, b"", [("ETag", quote_etag(tag, weak=True)), ("Vary", "Accept-Encoding")]
+
+    entry = key = None
+    if cached_model is not None:
+        key = cache_key(cached_model, versions[cached_model.__table__.name], full_path, encoding)
+        entry = cache.get(key)
+    if entry is not None:
+        payload, status, response_headers = entry
+    else:
+        status, body, next_cursor = await handler(session, args, **params)
+        payload, response_headers = render(scope, body, next_cursor)
+        if status == 200:
+            payload, response_headers = compressed(payload, response_headers, encoding)
+            if key is not None:
+                cache.set(key, (payload, status, response_headers), flask_app.config["CACHE_TTL"])
+        else:
+            response_headers.append(("Vary", "Accept-Encoding"))
+
+    if tag is not None and status == 200:
+        weak = any(name == "Content-Encoding" for name, _ in response_headers)
+        response_headers = [*response_headers, ("ETag", quote_etag(tag, weak=weak))]
+    return status, payload, response_headers
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                for async_engine in (engine, *replica_engines.values()):
+                    await async_engine.dispose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    headers = dict(scope["headers"]) if scope["type"] == "http" else {}
+    found = match(scope, headers) if scope["type"] == "http" else None
+    args = dict(parse_qsl(scope.get("query_string", b"").decode()))
+    # ?include= carga relaciones con la sesión síncrona: también va a Flask
+    if found is None or "stream" in args or "include" in args:
+        return await wsgi(scope, receive, send)
+    endpoint, handler, params = found
+    view = flask_app.view_functions[endpoint]
+
+    # mismo límite por cliente y endpoint que en Flask; el control de
+    # admisión no aplica aquí porque estas rutas no usan el pool síncrono
+    if limiter.enabled:
+        retry_after = rate_limited(scope, endpoint)
+        if retry_after is not None:
+            return await send_json(
+                scope, send, 429, {"error": "Demasiadas peticiones, reintenta más tarde"},
+                extra_headers=[("Retry-After", str(retry_after))])
+
+    try:
+        async with Session(bind=await read_engine(headers)) as session:
+            status, payload, response_headers = await respond(
+                scope, headers, session, view, handler, args, params)
+    except APIException as error:
+        return await send_json(scope, send, error.status_code, error.to_dict())
+    await send_response(send, status, payload, response_headers)
@@ -0,0 +1,168 @@
+import os
+import time
+import pickle
+import threading
+from abc import ABC, abstractmethod
+from functools import wraps
+from collections import OrderedDict
+from flask import request, make_response, current_app
+from werkzeug.local import LocalProxy
+from streaming import wants_stream
+from compression import negotiate, compress_response
+from versions import table_versions
+
+CACHE_URL = os.getenv("CACHE_URL", "")
+CACHE_TTL = int(os.getenv("CACHE_TTL", 60))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 1024))
+
+
+class CacheBackend(ABC):
+    # interfaz que debe implementar cualquier backend de cache; uno
+    # incompleto falla al crearlo, no en su primera llamada
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @abstractmethod
+    def get(self, key):
+        raise NotImplementedError
+
+    @abstractmethod
+    def set(self, key, value, ttl):
+        raise NotImplementedError
+
+    @abstractmethod
+    def size(self):
+        raise NotImplementedError
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": self.size(),
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class LRUCache(CacheBackend):
+    # cache en memoria del proceso, LRU con expiración por TTL
+
+    def __init__(self, max_entries):
+        super().__init__()
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def size(self):
+        return len(self._data)
+
+
+class RedisCache(CacheBackend):
+    # compatible con cualquier cliente estilo redis-py (get/set/scan_iter)
+
+    def __init__(self, client, key_prefix="cache:"):
+        super().__init__()
+        self.client = client
+        self.key_prefix = key_prefix
+
+    def get(self, key):
+        raw = self.client.get(self.key_prefix + key)
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return pickle.loads(raw)
+
+    def set(self, key, value, ttl):
+        self.client.set(self.key_prefix + key, pickle.dumps(value), ex=ttl)
+
+    def size(self):
+        return sum(1 for _ in self.client.scan_iter(match=self.key_prefix + "*"))
+
+
+def create_cache(config):
+    if config["CACHE_URL"]:
+        import redis
+        return RedisCache(redis.Redis.from_url(config["CACHE_URL"]))
+    return LRUCache(config["CACHE_MAX_ENTRIES"])
+
+
+def init_cache(app):
+    # cada app tiene su backend (app.extensions["cache"]), configurado con
+    # CACHE_URL, CACHE_TTL y CACHE_MAX_ENTRIES de app.config
+    for name, value in (("CACHE_URL", CACHE_URL), ("CACHE_TTL", CACHE_TTL),
+                        ("CACHE_MAX_ENTRIES", CACHE_MAX_ENTRIES)):
+        app.config.setdefault(name, value)
+    app.extensions["cache"] = create_cache(app.config)
+
+
+# el backend de la app en curso
+cache = LocalProxy(lambda: current_app.extensions["cache"])
+
+
+def cache_key(model, version, full_path, encoding):
+    # la versión de la tabla (versions.py) forma parte de la clave: tras
+    # cualquier escritura, en cualquier worker, las entradas viejas dejan de
+    # usarse y caducan solas (LRU o TTL)
+    return f"{model.__table__.name}@{version}:{full_path}|{encoding or 'identity'}"
+
+
+def cached(model):
+    # cachea respuestas 200 de GET que solo dependen de la tabla de `model`
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # con ?include= la respuesta depende de otras tablas: no se cachea
+            if request.method != "GET" or wants_stream() or request.args.get("include"):
+                return view(*args, **kwargs)
+
+            # una entrada por codificación, con los bytes ya comprimidos
+            encoding = negotiate()
+            version = table_versions([model])[model.__table__.name]
+            key = cache_key(model, version, request.full_path, encoding)
+            entry = cache.get(key)
+            if entry is not None:
+                body, status_code, headers = entry
+                response = make_response(body, status_code)
+                response.headers.clear()
+                response.headers.extend(headers)
+                return response
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                compress_response(response, encoding)
+                cache.set(key, (response.get_data(), response.status_code,
+                                list(response.headers.items())), current_app.config["CACHE_TTL"])
+            return response
+        wrapper.cached = model
+        return wrapper
+    return decorator
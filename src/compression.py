@@ -0,0 +1,115 @@
+# Compresión de respuestas negociada con Accept-Encoding (zstd, br, gzip),
+# hecha en la propia app para que funcione con gunicorn sin un proxy
+# delante. Las respuestas por debajo de COMPRESS_MIN_SIZE salen tal cual;
+# las respuestas en streaming se comprimen por trozos. cache.cached()
+# guarda ya los bytes comprimidos de cada codificación.
+
+import os
+import zlib
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # zstandard es opcional
+    zstandard = None
+
+# bytes mínimos para comprimir; por debajo la cabecera no compensa
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", 1024))
+COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", 6))
+COMPRESS_BR_LEVEL = int(os.getenv("COMPRESS_BR_LEVEL", 4))
+COMPRESS_ZSTD_LEVEL = int(os.getenv("COMPRESS_ZSTD_LEVEL", 3))
+COMPRESS_MIMETYPES = {"application/json", "application/x-ndjson", "text/html", "text/plain"}
+
+
+def gzip_compressor():
+    # wbits=31: formato gzip (cabecera y CRC), no zlib crudo
+    compressor = zlib.compressobj(COMPRESS_GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress, compressor.flush
+
+
+def br_compressor():
+    compressor = brotli.Compressor(quality=COMPRESS_BR_LEVEL)
+    return compressor.process, compressor.finish
+
+
+def zstd_compressor():
+    compressor = zstandard.ZstdCompressor(level=COMPRESS_ZSTD_LEVEL).compressobj()
+    return compressor.compress, compressor.flush
+
+
+# codificaciones disponibles, en orden de preferencia del servidor
+COMPRESSORS = {}
+if zstandard is not None:
+    COMPRESSORS["zstd"] = zstd_compressor
+if brotli is not None:
+    COMPRESSORS["br"] = br_compressor
+COMPRESSORS["gzip"] = gzip_compressor
+
+ENABLED = [name for name in os.getenv("COMPRESS_ENCODINGS", "zstd,br,gzip").split(",")
+           if name in COMPRESSORS]
+
+
+def negotiate(accept_encodings=None):
+    # mejor codificación aceptada por el cliente (respeta q=), o None;
+    # sin argumento, la de la petición de Flask en curso
+    if not ENABLED:
+        return None
+    if accept_encodings is None:
+        accept_encodings = request.accept_encodings
+    return accept_encodings.best_match(ENABLED)
+
+
+def compress(data, encoding):
+    process, finish = COMPRESSORS[encoding]()
+    return process(data) + finish()
+
+
+def compress_stream(chunks, encoding):
+    process, finish = COMPRESSORS[encoding]()
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        data = process(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+def compressible(response):
+    return (response.status_code == 200
+            and response.mimetype in COMPRESS_MIMETYPES
+            and "Content-Encoding" not in response.headers)
+
+
+def compress_response(response, encoding=None):
+    # comprime la respuesta en su sitio si procede; `encoding` permite
+    # reutilizar una negociación ya hecha (p. ej. en la caché)
+    response.vary.add("Accept-Encoding")
+    if encoding is None:
+        encoding = negotiate()
+    if encoding is None or not compressible(response):
+        return response
+
+    if response.is_streamed:
+        response.response = compress_stream(response.response, encoding)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return response
+        response.set_data(compress(data, encoding))
+
+    response.headers["Content-Encoding"] = encoding
+    # los bytes ya no son los mismos para cada codificación: ETag débil
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_compression(app):
+    app.after_request(compress_response)
@@ -0,0 +1,46 @@
+import hashlib
+from functools import wraps
+from flask import request, make_response, current_app
+from models import User, Planet, People, Vehicle, Favorite
+from versions import table_versions
+
+# tablas que pueden aparecer en una respuesta con ?include=
+INCLUDE_MODELS = (Favorite, User, Planet, Vehicle, People)
+
+
+def etag(full_path, accept, versions):
+    # misma petición y mismas versiones de sus tablas -> misma respuesta
+    raw = f"{full_path}|{accept}|{sorted(versions.items())}"
+    return hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+
+
+def dependencies(models, include):
+    if include:
+        return models + tuple(model for model in INCLUDE_MODELS if model not in models)
+    return models
+
+
+def conditional(*models):
+    # ETag a partir de la versión de cada tabla de la que depende la
+    # respuesta (versions.py, una consulta por clave primaria); si coincide
+    # con If-None-Match devolvemos 304 antes de tocar serialize()
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            versions = table_versions(dependencies(models, request.args.get("include")))
+            tag = etag(request.full_path, request.headers.get("Accept", ""), versions)
+
+            # comparación débil: las respuestas comprimidas llevan W/"..."
+            if request.if_none_match.contains_weak(tag):
+                response = current_app.response_class(status=304)
+                response.set_etag(tag, weak=True)
+                return response
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(tag, weak="Content-Encoding" in response.headers)
+            return response
+        # asgi.py lee de aquí las tablas de las que depende la vista
+        wrapper.conditional = models
+        return wrapper
+    return decorator
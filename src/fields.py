@@ -0,0 +1,102 @@
+# Proyecciones parciales y relaciones embebidas en listados y detalles:
+#
+#   GET /planets?fields=planet_name,climate&include=favorites
+#
+# ?fields= lee en SQL solo las columnas pedidas. El id, las columnas de
+# ?sort= y las claves de ?include= se leen igualmente porque el cursor y
+# las relaciones las necesitan, pero solo se devuelven si se piden.
+# ?include= añade cada relación con una consulta IN para toda la página,
+# nunca una por fila.
+
+from flask import request
+from utils import APIException
+from streaming import wants_stream
+from models import User, Planet, People, Vehicle, Favorite
+
+
+def favorites_by(column):
+    # favoritos enriquecidos agrupados por `column` (la FK hacia la fila)
+    def load(keys):
+        grouped = {key: [] for key in keys}
+        rows = Favorite.with_names().filter(column.in_(keys)).order_by(Favorite.id)
+        for row in rows:
+            grouped[getattr(row, column.key)].append(Favorite.serialize_with_names(row))
+        return grouped
+    return load
+
+
+def related(model):
+    # filas de `model` por id, para las FK de los favoritos
+    def load(keys):
+        return {row.id: model.serialize_row(row)
+                for row in model.rows().filter(model.id.in_(keys))}
+    return load
+
+
+# relaciones por modelo: nombre -> (columna de la fila que sirve de clave, carga)
+INCLUDES = {
+    User: {"favorites": ("id", favorites_by(Favorite.user_id))},
+    Planet: {"favorites": ("id", favorites_by(Favorite.planet_id))},
+    People: {"favorites": ("id", favorites_by(Favorite.characters_id))},
+    Vehicle: {"favorites": ("id", favorites_by(Favorite.vehicles_id))},
+    Favorite: {
+        "user": ("user_id", related(User)),
+        "planet": ("planet_id", related(Planet)),
+        "vehicle": ("vehicles_id", related(Vehicle)),
+        "character": ("characters_id", related(People)),
+    },
+}
+
+
+def names_list(args, name):
+    return [item.strip() for item in args.get(name, "").split(",") if item.strip()]
+
+
+def parse_fields(model, allowed=None, args=None):
+    # None si no se pide ?fields=; si no, los campos en el orden del modelo
+    if args is None:
+        args = request.args
+    if "fields" not in args:
+        return None
+    allowed = allowed or model.serialize_columns
+    names = names_list(args, "fields")
+    if not names:
+        raise APIException("El parámetro fields está vacío", status_code=400)
+    unknown = sorted(set(names) - set(allowed))
+    if unknown:
+        raise APIException(f"Campos desconocidos: {', '.join(unknown)}", status_code=400)
+    return tuple(name for name in allowed if name in names)
+
+
+def parse_include(model, args=None):
+    if args is None:
+        args = request.args
+    names = names_list(args, "include")
+    unknown = sorted(set(names) - set(INCLUDES.get(model, {})))
+    if unknown:
+        raise APIException(f"No se puede incluir: {', '.join(unknown)}", status_code=400)
+    return tuple(dict.fromkeys(names))
+
+
+def parse_sparse(model, order=(), allowed=None):
+    # (fields, include, extra): `extra` son las columnas que hay que leer
+    # aunque no se devuelvan
+    fields = parse_fields(model, allowed)
+    include = parse_include(model)
+    if include and wants_stream():
+        raise APIException("include no está disponible en modo streaming", status_code=400)
+    extra = tuple(column.key for column, _ in order)
+    extra += tuple(INCLUDES[model][name][0] for name in include)
+    return fields, include, extra
+
+
+def embed(model, include, rows, items):
+    # añade a cada item serializado las relaciones pedidas; `rows` son las
+    # filas de las que salen los items, en el mismo orden
+    for name in include:
+        key, load = INCLUDES[model][name]
+        keys = {getattr(row, key) for row in rows} - {None}
+        values = load(keys) if keys else {}
+        for row, item in zip(rows, items):
+            item[name] = values.get(getattr(row, key))
+    return items
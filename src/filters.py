@@ -0,0 +1,89 @@
+# Filtros y orden declarativos para los listados, aplicados en SQL:
+#
+#   ?climate=arid&poblation__gt=1000&sort=-speed,id
+#
+# Solo se aceptan las columnas que el modelo serializa (serialize_columns);
+# para ordenar, además, que no admitan NULL.
+# Operadores: eq (por defecto), ne, gt, gte, lt, lte, in (separado por
+# comas) y prefix (empieza por).
+
+from flask import request
+from utils import APIException
+
+OPERATORS = {
+    "eq": lambda column, value: column == value,
+    "ne": lambda column, value: column != value,
+    "gt": lambda column, value: column > value,
+    "gte": lambda column, value: column >= value,
+    "lt": lambda column, value: column < value,
+    "lte": lambda column, value: column <= value,
+    "in": lambda column, values: column.in_(values),
+    "prefix": lambda column, value: column.startswith(value, autoescape=True),
+}
+
+# parámetros que no son filtros
+RESERVED = {"limit", "cursor", "sort", "stream", "fields", "include", "q"}
+
+
+def coerce(model, name, value):
+    python_type = getattr(model, name).type.python_type
+    if python_type is bool:
+        return value.lower() in ("1", "true")
+    try:
+        return python_type(value)
+    except ValueError:
+        raise APIException(f"Valor inválido para {name}: '{value}'", status_code=400)
+
+
+def column_for(model, name):
+    if name not in model.serialize_columns:
+        raise APIException(f"No se puede filtrar ni ordenar por '{name}'", status_code=400)
+    return getattr(model, name)
+
+
+def parse_filters(model, args=None):
+    if args is None:
+        args = request.args
+    criteria = []
+    for key, value in args.items():
+        if key in RESERVED:
+            continue
+        name, _, operator = key.partition("__")
+        operator = operator or "eq"
+        if operator not in OPERATORS:
+            raise APIException(f"Operador desconocido '{operator}'", status_code=400)
+        column = column_for(model, name)
+        if operator == "in":
+            value = [coerce(model, name, item) for item in value.split(",")]
+        elif operator == "prefix":
+            value = str(value)
+        else:
+            value = coerce(model, name, value)
+        criteria.append(OPERATORS[operator](column, value))
+    return criteria
+
+
+def parse_sort(model, args=None):
+    # devuelve [(columna, descendente)], el formato que espera keyset()
+    if args is None:
+        args = request.args
+    order = []
+    for name in filter(None, args.get("sort", "").split(",")):
+        descending = name.startswith("-")
+        name = name.lstrip("-")
+        column = column_for(model, name)
+        # NULL no se puede comparar en el cursor y además se ordena distinto
+        # según la base de datos (primero en SQLite, al final en Postgres)
+        if column.expression.nullable:
+            raise APIException(f"No se puede ordenar por '{name}': admite valores nulos",
+                               status_code=400)
+        order.append((column, descending))
+        if name == "id":
+            # el id es único: lo que venga detrás no cambia el orden
+            break
+    return order
+
+
+def apply_filters(query, model, args=None):
+    criteria = parse_filters(model, args)
+    return query.filter(*criteria) if criteria else query
@@ -0,0 +1,196 @@
+# Group commit opcional para POST /favorites (GROUP_COMMIT=1). Las altas
+# que llegan a la vez se encolan y un único hilo escritor las agrupa:
+# espera hasta GROUP_COMMIT_WINDOW_MS desde la primera (o hasta juntar
+# GROUP_COMMIT_MAX_BATCH), las inserta en una sola transacción y hace un
+# solo commit (un solo fsync en Postgres). Cada petición recibe su propio
+# resultado a través de un Future.
+#
+# - Errores: si la transacción del lote falla se reintenta cada alta por
+#   separado, así el error solo llega a quien lo causó.
+# - Contrapresión: la cola admite GROUP_COMMIT_MAX_QUEUE altas; si está
+#   llena la petición recibe un 503 en lugar de acumular latencia.
+# - Conexiones: la petición devuelve la suya al pool antes de esperar y el
+#   escritor usa un engine propio de una sola conexión; si compartieran
+#   pool, las peticiones en espera lo agotarían y el escritor no tendría
+#   con qué confirmarlas.
+# - Tiempo de espera: pasado GROUP_COMMIT_TIMEOUT el alta se cancela si aún
+#   está en la cola (503, no se escribirá); si el escritor ya la tiene se
+#   espera a su resultado, así nunca se responde 503 a algo que se guarda.
+# - Cada app tiene su propio GroupCommitter (app.extensions["group_commit"])
+#   y lee estos ajustes de app.config; las variables de entorno son los
+#   valores por defecto.
+# - Solo agrupa peticiones del mismo proceso: con gunicorn hace falta un
+#   worker con hilos (-k gthread --threads N) para que haya concurrencia.
+
+import os
+import queue
+import time
+import logging
+import threading
+from concurrent.futures import Future
+from sqlalchemy import create_engine, or_
+from sqlalchemy.exc import SQLAlchemyError
+from flask import current_app
+from sqlalchemy.orm import Session
+from werkzeug.local import LocalProxy
+from models import db, insert_ignore, Favorite
+from materialized import refresh_user_favorites
+from stats import bump_counts
+from utils import APIException
+
+logger = logging.getLogger(__name__)
+
+GROUP_COMMIT = os.getenv("GROUP_COMMIT", "").lower() in ("1", "true")
+GROUP_COMMIT_WINDOW_MS = float(os.getenv("GROUP_COMMIT_WINDOW_MS", 3))
+GROUP_COMMIT_MAX_BATCH = int(os.getenv("GROUP_COMMIT_MAX_BATCH", 100))
+GROUP_COMMIT_MAX_QUEUE = int(os.getenv("GROUP_COMMIT_MAX_QUEUE", 1000))
+# tiempo máximo que una petición espera su resultado
+GROUP_COMMIT_TIMEOUT = float(os.getenv("GROUP_COMMIT_TIMEOUT", 10))
+
+
+def apply_favorite(session, values):
+    # (status, favorito): 201 si se crea, 200 con el existente si ya estaba
+    new_id = session.execute(
+        insert_ignore(Favorite).values(**values).returning(Favorite.id)).scalar()
+    if new_id is not None:
+        return 201, {"id": new_id, **values}
+    targets = [getattr(Favorite, column) == values[column]
+               for column in ("planet_id", "vehicles_id", "characters_id")
+               if values[column]]
+    existing = session.execute(
+        Favorite.select_rows()
+        .where(Favorite.user_id == values["user_id"], or_(*targets))
+        .order_by(Favorite.id)).first()
+    return 200, Favorite.serialize_row(existing)
+
+
+def writer_engine(engine, options):
+    # engine del hilo escritor: misma base de datos, una sola conexión
+    if "pool_size" not in options:
+        # SQLite en memoria: otro engine sería otra base de datos
+        return engine
+    return create_engine(engine.url, **{**options, "pool_size": 1, "max_overflow": 0})
+
+
+class GroupCommitter:
+    def __init__(self):
+        self.enabled = False
+        self.app = None
+        self.engine = None
+        self.queue = None
+        self.window = 0.0
+        self.max_batch = 0
+        self.timeout = 0.0
+        self.batches = 0
+        self.committed = 0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        for name, value in (("GROUP_COMMIT", GROUP_COMMIT),
+                            ("GROUP_COMMIT_WINDOW_MS", GROUP_COMMIT_WINDOW_MS),
+                            ("GROUP_COMMIT_MAX_BATCH", GROUP_COMMIT_MAX_BATCH),
+                            ("GROUP_COMMIT_MAX_QUEUE", GROUP_COMMIT_MAX_QUEUE),
+                            ("GROUP_COMMIT_TIMEOUT", GROUP_COMMIT_TIMEOUT)):
+            app.config.setdefault(name, value)
+        app.extensions["group_commit"] = self
+        self.enabled = app.config["GROUP_COMMIT"]
+        if not self.enabled:
+            return
+        self.app = app
+        with app.app_context():
+            self.engine = writer_engine(db.engine, app.config["SQLALCHEMY_ENGINE_OPTIONS"])
+        self.window = app.config["GROUP_COMMIT_WINDOW_MS"] / 1000
+        self.max_batch = app.config["GROUP_COMMIT_MAX_BATCH"]
+        self.timeout = app.config["GROUP_COMMIT_TIMEOUT"]
+        self.queue = queue.Queue(maxsize=app.config["GROUP_COMMIT_MAX_QUEUE"])
+
+    def _ensure_thread(self):
+        # el hilo se arranca con la primera alta, ya dentro del worker (no
+        # antes del fork de gunicorn)
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(
+                        target=self._run, name="group-commit", daemon=True)
+                    self._thread.start()
+
+    def submit(self, values):
+        # encola el alta y espera su resultado: (status, favorito)
+        self._ensure_thread()
+        # la conexión de la petición (la de las búsquedas de nombres) vuelve
+        # al pool mientras se espera
+        db.session.close()
+        future = Future()
+        try:
+            self.queue.put_nowait((values, future))
+        except queue.Full:
+            raise APIException("Demasiadas escrituras pendientes, reintenta", status_code=503)
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            if future.cancel():
+                raise APIException("La escritura no se confirmó a tiempo", status_code=503)
+        # el escritor ya la está confirmando
+        return future.result()
+
+    def _run(self):
+        # contexto de la app: los listeners de versions.on_commit() son suyos
+        with self.app.app_context():
+            while True:
+                self._next_batch()
+
+    def _next_batch(self):
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        # las altas canceladas por tiempo de espera no se escriben
+        batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            self._commit(batch)
+        except Exception as error:
+            # nunca dejar peticiones esperando si algo inesperado falla
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+
+    def _commit(self, batch):
+        try:
+            with Session(bind=self.engine) as session:
+                results = [apply_favorite(session, values) for values, _ in batch]
+                created = [values for (values, _), (status, _) in zip(batch, results)
+                           if status == 201]
+                bump_counts(created, session=session)
+                refresh_user_favorites({values["user_id"] for values in created}, session)
+                session.commit()
+        except SQLAlchemyError as error:
+            if len(batch) == 1:
+                batch[0][1].set_exception(error)
+                return
+            logger.warning("Falló un lote de %d favoritos, se reintenta uno a uno: %s",
+                           len(batch), error)
+            for item in batch:
+                self._commit([item])
+            return
+
+        self.batches += 1
+        self.committed += len(batch)
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def stats(self):
+        return {"enabled": self.enabled, "batches": self.batches, "committed": self.committed,
+                "queued": self.queue.qsize() if self.queue is not None else 0}
+
+
+# el GroupCommitter de la app en curso
+group_commit = LocalProxy(lambda: current_app.extensions["group_commit"])
@@ -0,0 +1,80 @@
+import re
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy.engine import Row
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional, sin él usamos json de la stdlib
+    orjson = None
+
+
+# lo que json.dumps(ensure_ascii=True) escapa y orjson no: DEL y no ASCII
+NON_ASCII = re.compile(r"[^\x00-\x7e]")
+
+
+def escape_non_ascii(match):
+    # como json.dumps(ensure_ascii=True): \uXXXX en minúsculas y
+    # pares sustitutos fuera del plano básico
+    code = ord(match.group())
+    if code > 0xFFFF:
+        code -= 0x10000
+        return "\\u%04x\\u%04x" % (0xD800 | (code >> 10), 0xDC00 | (code & 0x3FF))
+    return "\\u%04x" % code
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    # Codifica con orjson cuando está instalado y con json de la stdlib si
+    # no, con la misma salida que el proveedor de Flask: claves ordenadas,
+    # formato compacto, no ASCII escapado (\u00f1), fechas como fecha HTTP
+    # (OPT_PASSTHROUGH_DATETIME las deja a default()) y, si orjson no puede
+    # con algo (p. ej. enteros de más de 64 bits), se repite con la stdlib.
+    # Única diferencia: NaN e Infinity salen como null y no como NaN.
+    # loads() es siempre el de la stdlib: orjson convierte los enteros
+    # grandes en float.
+
+    @staticmethod
+    def default(o):
+        # filas proyectadas y modelos se codifican directamente
+        if isinstance(o, Row):
+            return o._asdict()
+        if hasattr(o, "serialize"):
+            return o.serialize()
+        return DefaultJSONProvider.default(o)
+
+    def _options(self, pretty=False):
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | \
+            orjson.OPT_PASSTHROUGH_DATACLASS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if pretty:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def _orjson(self, obj, pretty=False):
+        # texto JSON, o None si orjson no puede codificar `obj`
+        try:
+            text = orjson.dumps(obj, default=self.default, option=self._options(pretty)).decode()
+        except orjson.JSONEncodeError:
+            return None
+        if self.ensure_ascii and (not text.isascii() or "\x7f" in text):
+            text = NON_ASCII.sub(escape_non_ascii, text)
+        return text
+
+    def dumps(self, obj, **kwargs):
+        # orjson solo genera el formato compacto
+        if orjson is None or set(kwargs) - {"separators"} or \
+                kwargs.get("separators", (",", ":")) != (",", ":"):
+            return super().dumps(obj, **kwargs)
+        text = self._orjson(obj)
+        return super().dumps(obj, **kwargs) if text is None else text
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = (self.compact is None and self._app.debug) or self.compact is False
+        text = self._orjson(obj, pretty)
+        if text is None:
+            return super().response(*args, **kwargs)
+        # Flask termina las respuestas JSON con un salto de línea
+        return self._app.response_class(text + "\n", mimetype=self.mimetype)
@@ -0,0 +1,117 @@
+# Mantenimiento incremental de la tabla user_favorites. Cada escritura que
+# afecta a los favoritos de un usuario recalcula solo las filas de esos
+# usuarios, dentro de la misma transacción que la escritura.
+#
+# Concurrencia: antes de leer los favoritos se bloquea la fila de cada
+# usuario (SELECT ... FOR NO KEY UPDATE), así dos recálculos del mismo
+# usuario se ejecutan uno detrás de otro y el segundo lee lo que confirmó
+# el primero; con un FOR UPDATE normal dos altas del mismo usuario se
+# bloquearían en cruz con el FOR KEY SHARE de la clave foránea de favorite.
+# La escritura es un upsert por user_id, de modo que dos recálculos (p. ej.
+# dos GET de un usuario aún no materializado) nunca chocan en la clave.
+
+from sqlalchemy import event, delete, inspect, select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.orm import Session
+from models import db, User, Planet, People, Vehicle, Favorite, UserFavorites
+from replicas import use_primary
+
+# columnas de catálogo que aparecen en los favoritos enriquecidos
+NAME_COLUMNS = {
+    User: ("first_name", "email"),
+    Planet: ("planet_name",),
+    Vehicle: ("model",),
+    People: ("name",),
+}
+
+
+def upsert():
+    # INSERT que reemplaza la fila materializada si ya existe
+    dialect = db.engine.dialect.name
+    if dialect == "mysql":
+        statement = mysql.insert(UserFavorites)
+        return statement.on_duplicate_key_update(
+            user_name=statement.inserted.user_name, favorites=statement.inserted.favorites)
+    dialects = {"postgresql": postgresql, "sqlite": sqlite}
+    statement = dialects[dialect].insert(UserFavorites)
+    return statement.on_conflict_do_update(
+        index_elements=["user_id"],
+        set_={"user_name": statement.excluded.user_name,
+              "favorites": statement.excluded.favorites})
+
+
+def refresh_user_favorites(user_ids, session=None):
+    # dos consultas y una sentencia sin importar cuántos usuarios sean
+    session = session or db.session
+    user_ids = set(user_ids)
+    if not user_ids:
+        return {}
+    # se reescribe a partir de lo leído: nada de leer de una réplica
+    use_primary()
+
+    # bloqueo en orden de id: dos recálculos nunca se esperan en cruz
+    users = dict(session.execute(
+        select(User.id, User.first_name).where(User.id.in_(user_ids))
+        .order_by(User.id).with_for_update(key_share=True)).all())
+    rows = session.execute(
+        Favorite.select_with_names()
+        .where(Favorite.user_id.in_(users))
+        .order_by(Favorite.id)).all()
+
+    favorites = {user_id: [] for user_id in users}
+    for row in rows:
+        favorites[row.user_id].append(Favorite.serialize_with_names(row))
+
+    entries = [{"user_id": user_id, "user_name": users[user_id], "favorites": items}
+               for user_id, items in favorites.items()]
+    if entries:
+        session.execute(upsert(), entries)
+    # usuarios que ya no existen
+    missing = user_ids - users.keys()
+    if missing:
+        session.execute(delete(UserFavorites).where(UserFavorites.user_id.in_(missing)))
+    return {entry["user_id"]: entry for entry in entries}
+
+
+def user_favorites(user_id):
+    # lectura por clave primaria; si el usuario aún no está materializado
+    # (p. ej. datos anteriores a la tabla) se calcula y se guarda
+    entry = db.session.execute(
+        select(UserFavorites.user_name, UserFavorites.favorites)
+        .where(UserFavorites.user_id == user_id)).first()
+    if entry is not None:
+        return entry.user_name, entry.favorites
+
+    entry = refresh_user_favorites([user_id]).get(user_id)
+    db.session.commit()
+    if entry is None:
+        return None, None
+    return entry["user_name"], entry["favorites"]
+
+
+@event.listens_for(Session, "after_flush")
+def collect_renames(session, flush_context):
+    # renombrados de catálogo (p. ej. desde el admin): anotamos qué
+    # usuarios tienen favoritos afectados
+    affected = session.info.setdefault("user_favorites.stale", set())
+    for instance in session.dirty:
+        columns = NAME_COLUMNS.get(type(instance))
+        if not columns:
+            continue
+        state = inspect(instance)
+        if not any(state.attrs[column].history.has_changes() for column in columns):
+            continue
+        if isinstance(instance, User):
+            affected.add(instance.id)
+        else:
+            target = {Planet: Favorite.planet_id, Vehicle: Favorite.vehicles_id,
+                      People: Favorite.characters_id}[type(instance)]
+            affected.update(session.execute(
+                select(Favorite.user_id).where(target == instance.id).distinct()).scalars())
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def refresh_renames(session, flush_context):
+    affected = session.info.pop("user_favorites.stale", None)
+    if affected:
+        refresh_user_favorites(affected, session)
@@ -1,15 +1,94 @@
+from functools import lru_cache
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import String, Boolean, Column, Integer, ForeignKey
+from sqlalchemy import String, Boolean, Column, Integer, BigInteger, ForeignKey, JSON, UniqueConstraint, Index, select, insert
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Mapped, mapped_column, relationship
+from replicas import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 
-class User(db.Model):
+def insert_ignore(model):
+    # INSERT que ignora (sin error) las filas que violan una restricción única
+    dialect = db.engine.dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(model).on_conflict_do_nothing()
+    if dialect == "sqlite":
+        return sqlite.insert(model).on_conflict_do_nothing()
+    return insert(model).prefix_with("IGNORE")
+
+
+def insert_returning(model, rows, session=None):
+    # INSERT ... RETURNING de varias filas, devueltas en el orden de `rows`.
+    # SQLite no tiene centinela implícito y, si se pide ese orden,
+    # SQLAlchemy manda una sentencia por fila; ahí se inserta sin pedirlo
+    # (una sentencia por lote) y se ordena por id, que SQLite asigna
+    # creciente fila a fila.
+    session = session or db.session
+    if db.engine.dialect.name == "sqlite":
+        created = session.scalars(insert(model).returning(model), rows).all()
+        return sorted(created, key=lambda instance: instance.id)
+    return session.scalars(
+        insert(model).returning(model, sort_by_parameter_order=True), rows).all()
+
+
+@lru_cache(maxsize=256)
+def compile_serializer(keys, columns=None):
+    # genera `lambda row: {"id": row[0], ...}`, más rápido que dict(zip());
+    # `columns` es el orden de la fila si no coincide con `keys` (p. ej. con
+    # ?fields= se leen columnas que no se devuelven)
+    columns = columns or keys
+    body = ", ".join(f"{key!r}: row[{columns.index(key)}]" for key in keys)
+    return eval(f"lambda row: {{{body}}}")
+
+
+class Projection:
+    # Ruta de serialización por columnas: selecciona solo las columnas de
+    # serialize() como tuplas (sin identity map ni estado de instancia) y
+    # las convierte a dict con un serializador precompilado por modelo.
+    serialize_columns = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.serialize_row = staticmethod(compile_serializer(cls.serialize_columns))
+
+    @classmethod
+    def selected_columns(cls, fields=None, extra=()):
+        # con ?fields= se leen solo las columnas pedidas, más el id y las
+        # que necesite el cursor (`extra`), en el orden de serialize_columns
+        if fields is None:
+            return cls.serialize_columns
+        wanted = {"id", *fields, *extra}
+        return tuple(name for name in cls.serialize_columns if name in wanted)
+
+    @classmethod
+    def projection(cls, fields=None, extra=()):
+        return [getattr(cls, name) for name in cls.selected_columns(fields, extra)]
+
+    @classmethod
+    def row_serializer(cls, fields=None, extra=()):
+        if fields is None:
+            return cls.serialize_row
+        return compile_serializer(tuple(fields), cls.selected_columns(fields, extra))
+
+    @classmethod
+    def rows(cls, fields=None, extra=()):
+        return cls.query.with_entities(*cls.projection(fields, extra))
+
+    @classmethod
+    def select_rows(cls, fields=None, extra=()):
+        # lo mismo que rows() pero como select(), p. ej. para AsyncSession
+        return select(*cls.projection(fields, extra))
+
+
+class User(Projection, db.Model):
+    serialize_columns = ("id", "first_name", "email")
+
     id: Mapped[int] = mapped_column(primary_key=True)
     email: Mapped[str] = mapped_column(
         String(120), unique=True, nullable=False)
-    first_name: Mapped[str] = mapped_column(String(120), nullable=False)
+    first_name: Mapped[str] = mapped_column(
+        String(120), nullable=False, index=True)
     password: Mapped[str] = mapped_column(nullable=False)
     is_active: Mapped[bool] = mapped_column(Boolean(), nullable=False)
 
@@ -24,12 +103,18 @@ class User(db.Model):
         }
 
 
-class Planet(db.Model):
+class Planet(Projection, db.Model):
 
     __tablename__ = 'planet'
+    serialize_columns = ("id", "planet_name", "periodo_de_rotacion", "climate", "poblation")
+    # índices para los filtros/orden más habituales de GET /planets
+    __table_args__ = (
+        Index('ix_planet_climate_poblation', 'climate', 'poblation'),
+        Index('ix_planet_poblation', 'poblation'),
+    )
 
     id = Column(Integer, primary_key=True, nullable=False, unique=True)
-    planet_name = Column(String(100), nullable=False)
+    planet_name = Column(String(100), nullable=False, index=True)
     periodo_de_rotacion = Column(Integer, nullable=False)
     climate = Column(String(100), nullable=False)
     poblation = Column(Integer, nullable=False)
@@ -46,12 +131,16 @@ class Planet(db.Model):
         }
 
 
-class People(db.Model):
+class People(Projection, db.Model):
 
     __tablename__ = 'people'
+    serialize_columns = ("id", "name", "age", "hair_color", "birth_year")
+    __table_args__ = (
+        Index('ix_people_hair_color_age', 'hair_color', 'age'),
+    )
 
     id = Column(Integer, primary_key=True, nullable=False, unique=True)
-    name = Column(String(100), nullable=False)
+    name = Column(String(100), nullable=False, index=True)
     age = Column(Integer, nullable=False)
     hair_color = Column(String(100), nullable=False)
     birth_year = Column(Integer, nullable=False)
@@ -68,12 +157,17 @@ class People(db.Model):
         }
 
 
-class Vehicle(db.Model):
+class Vehicle(Projection, db.Model):
 
     __tablename__ = 'vehicle'
+    serialize_columns = ("id", "model", "speed", "pilot", "length")
+    __table_args__ = (
+        Index('ix_vehicle_speed', 'speed'),
+        Index('ix_vehicle_pilot_speed', 'pilot', 'speed'),
+    )
 
     id = Column(Integer, primary_key=True, nullable=False, unique=True)
-    model = Column(String(100), nullable=False)
+    model = Column(String(100), nullable=False, index=True)
     speed = Column(Integer, nullable=False)
     pilot = Column(String(100), nullable=False)
     length = Column(Integer, nullable=False)
@@ -90,8 +184,15 @@ class Vehicle(db.Model):
         }
 
 
-class Favorite(db.Model):
+class Favorite(Projection, db.Model):
     __tablename__ = 'favorite'
+    # un usuario no puede repetir el mismo planeta, vehículo o personaje
+    __table_args__ = (
+        UniqueConstraint('user_id', 'planet_id', name='uq_favorite_user_planet'),
+        UniqueConstraint('user_id', 'vehicles_id', name='uq_favorite_user_vehicle'),
+        UniqueConstraint('user_id', 'characters_id', name='uq_favorite_user_character'),
+    )
+    serialize_columns = ("id", "user_id", "planet_id", "vehicles_id", "characters_id")
 
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('user.id'), nullable=False)
@@ -107,3 +208,121 @@ class Favorite(db.Model):
             "vehicles_id": self.vehicles_id,
             "characters_id": self.characters_id,
         }
+
+    @staticmethod
+    def serialize_with_names(row):
+        # row viene de Favorite.with_names()
+        data = {
+            "id": row.id,
+            "user_id": row.user_id,
+            "planet_id": row.planet_id,
+            "vehicles_id": row.vehicles_id,
+            "characters_id": row.characters_id,
+            "user_name": row.user_name,
+            "user_email": row.user_email,
+        }
+
+        if row.planet_id:
+            data["planet_name"] = row.planet_name
+
+        if row.vehicles_id:
+            data["vehicle_model"] = row.vehicle_model
+
+        if row.characters_id:
+            data["character_name"] = row.character_name
+
+        return data
+
+    # columnas que with_names() trae de otras tablas: etiqueta -> columna
+    name_fields = ("user_name", "user_email", "planet_name", "vehicle_model", "character_name")
+
+    @classmethod
+    def name_columns(cls):
+        return {
+            "user_name": User.first_name,
+            "user_email": User.email,
+            "planet_name": Planet.planet_name,
+            "vehicle_model": Vehicle.model,
+            "character_name": People.name,
+        }
+
+    @classmethod
+    def selected_names(cls, fields=None):
+        if fields is None:
+            return cls.name_fields
+        return tuple(name for name in cls.name_fields if name in fields)
+
+    @classmethod
+    def names_projection(cls, fields=None, extra=()):
+        columns = cls.name_columns()
+        return cls.projection(fields, extra) + [
+            columns[name].label(name) for name in cls.selected_names(fields)]
+
+    @classmethod
+    def names_serializer(cls, fields=None, extra=()):
+        if fields is None:
+            return cls.serialize_with_names
+        return compile_serializer(
+            tuple(fields), cls.selected_columns(fields, extra) + cls.selected_names(fields))
+
+    @classmethod
+    def join_names(cls, query, fields=None):
+        # LEFT JOIN a user, planet, vehicle y people; vale para Query y
+        # select(). Con ?fields= solo se unen las tablas cuyas columnas se piden
+        joins = [
+            (User, cls.user_id == User.id, ("user_name", "user_email")),
+            (Planet, cls.planet_id == Planet.id, ("planet_name",)),
+            (Vehicle, cls.vehicles_id == Vehicle.id, ("vehicle_model",)),
+            (People, cls.characters_id == People.id, ("character_name",)),
+        ]
+        query = query.select_from(cls)
+        for table, on, names in joins:
+            if fields is None or any(name in fields for name in names):
+                query = query.outerjoin(table, on)
+        return query
+
+    @classmethod
+    def with_names(cls, fields=None, extra=()):
+        # una sola consulta proyectando solo las columnas que se serializan
+        return cls.join_names(db.session.query(*cls.names_projection(fields, extra)), fields)
+
+    @classmethod
+    def select_with_names(cls, fields=None, extra=()):
+        return cls.join_names(select(*cls.names_projection(fields, extra)), fields)
+
+
+class UserFavorites(db.Model):
+    # Favoritos ya enriquecidos de cada usuario (lo mismo que devuelve
+    # GET /users/<id>/favorites), mantenido por materialized.py. Leerlos es
+    # una sola búsqueda por clave primaria.
+    __tablename__ = 'user_favorites'
+
+    user_id = Column(Integer, ForeignKey('user.id'), primary_key=True)
+    user_name = Column(String(120), nullable=False)
+    favorites = Column(JSON, nullable=False)
+
+
+class FavoriteCount(db.Model):
+    # Contadores de favoritos por entidad ("planet", "vehicle", "character")
+    # y por usuario ("user"), actualizados en la misma transacción que cada
+    # alta o baja (stats.py). El índice por (kind, count) sirve el top-N
+    # leyendo solo las filas que se devuelven.
+    __tablename__ = 'favorite_count'
+    __table_args__ = (
+        Index('ix_favorite_count_kind_count', 'kind', 'count', 'target_id'),
+    )
+
+    kind = Column(String(20), primary_key=True)
+    target_id = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class TableVersion(db.Model):
+    # Versión de cada tabla de la API, incrementada por versions.py con
+    # cada escritura en ella (ver allí cuándo). Sustituye a
+    # count/max(id) en ETags y cache: un id reutilizado o un renombrado
+    # también cambian la versión.
+    __tablename__ = 'table_version'
+
+    name = Column(String(50), primary_key=True)
+    version = Column(BigInteger, nullable=False)
@@ -0,0 +1,114 @@
+import os
+import json
+import base64
+from urllib.parse import urlencode
+from flask import request, jsonify
+from sqlalchemy import and_, or_
+from utils import APIException
+
+# tamaño de página por defecto y máximo permitido por el servidor
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", 100))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", 500))
+
+
+def encode_cursor(last_id, keys=()):
+    payload = {"id": last_id}
+    if keys:
+        payload["k"] = list(keys)
+    raw = json.dumps(payload).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    # devuelve {"id": ..., "k": [valores de las columnas de orden]}
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+        last_id = payload["id"]
+        keys = payload.get("k", [])
+    except (ValueError, KeyError, TypeError, AttributeError):
+        raise APIException("Cursor inválido", status_code=400)
+    if not isinstance(last_id, int) or not isinstance(keys, list):
+        raise APIException("Cursor inválido", status_code=400)
+    return {"id": last_id, "k": keys}
+
+
+def page_args(args=None):
+    # args: request.args por defecto, o cualquier mapping (p. ej. en ASGI)
+    if args is None:
+        args = request.args
+    limit = args.get("limit", DEFAULT_PAGE_SIZE)
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise APIException("El parámetro limit debe ser un número", status_code=400)
+    if limit < 1:
+        raise APIException("El parámetro limit debe ser mayor que 0", status_code=400)
+
+    cursor = args.get("cursor")
+    after = decode_cursor(cursor) if cursor else None
+    return min(limit, MAX_PAGE_SIZE), after
+
+
+def sort_keys(id_column, order=()):
+    # `order` es una lista de (columna, descendente); el id desempata si no
+    # está ya en el orden
+    keys = list(order)
+    if not any(column.key == id_column.key for column, _ in keys):
+        keys.append((id_column, False))
+    return keys
+
+
+def ordered(query, id_column, order=()):
+    return query.order_by(*(column.desc() if descending else column
+                            for column, descending in sort_keys(id_column, order)))
+
+
+def keyset(query, id_column, limit, after, order=()):
+    # Paginación por clave (keyset): WHERE (orden, id) > cursor ORDER BY
+    # orden, id LIMIT n, así una página profunda cuesta lo mismo que la
+    # primera. Sirve tanto para Query como para select(). Pedimos una fila
+    # de más para saber si hay página siguiente.
+    keys = sort_keys(id_column, order)
+    if after is not None:
+        values = after["k"] + [after["id"]]
+        if len(values) != len(keys):
+            raise APIException("El cursor no corresponde a este orden", status_code=400)
+        # un cursor manipulado no debe llegar a la base de datos con otro tipo
+        for (column, _), value in zip(keys, values):
+            if not isinstance(value, column.type.python_type):
+                raise APIException("Cursor inválido", status_code=400)
+        clauses = []
+        for index, (column, descending) in enumerate(keys):
+            equal = [previous == value for (previous, _), value in zip(keys[:index], values)]
+            after_value = column < values[index] if descending else column > values[index]
+            clauses.append(and_(*equal, after_value))
+        query = query.filter(or_(*clauses))
+    return ordered(query, id_column, order).limit(limit + 1)
+
+
+def split_page(rows, limit, order=()):
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        return rows, encode_cursor(last.id, [getattr(last, column.key)
+                                             for column, _ in order
+                                             if column.key != "id"])
+    return rows, None
+
+
+def paginate(query, id_column, order=()):
+    limit, after = page_args()
+    rows = keyset(query, id_column, limit, after, order).all()
+    return split_page(rows, limit, order)
+
+
+def page_response(items, next_cursor, status_code=200):
+    response = jsonify(items)
+    response.status_code = status_code
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+        args = request.args.to_dict()
+        args["cursor"] = next_cursor
+        response.headers["Link"] = f'<{request.base_url}?{urlencode(args)}>; rel="next"'
+    return response
@@ -0,0 +1,136 @@
+import os
+import time
+import threading
+import weakref
+from sqlalchemy import event, text
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+
+class PoolStats:
+    # contadores de un pool de este proceso (cada worker de gunicorn tiene
+    # los suyos); uno por engine: primario y cada réplica
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def record_wait(self, seconds, timed_out=False):
+        with self._lock:
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def to_dict(self):
+        with self._lock:
+            waits = self.checkouts + self.timeouts
+            return {
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "connects": self.connects,
+                "timeouts": self.timeouts,
+                "wait_avg_ms": round(self.wait_total / waits * 1000, 3) if waits else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+            }
+
+
+# engine -> PoolStats
+engine_stats = weakref.WeakKeyDictionary()
+
+
+class TimedQueuePool(QueuePool):
+    # QueuePool que mide cuánto espera cada petición por una conexión
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def recreate(self):
+        # engine.dispose() crea un pool nuevo: los contadores siguen
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        self.stats.record_wait(time.perf_counter() - start)
+        return connection
+
+
+def engine_options(database_uri, timed=True):
+    # opciones del engine a partir de variables de entorno; con gunicorn
+    # cada worker abre hasta DB_POOL_SIZE + DB_MAX_OVERFLOW conexiones.
+    # timed=False deja el pool por defecto (necesario en engines async)
+    options = {
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true"),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 1800)),
+    }
+    if database_uri == "sqlite://" or ":memory:" in database_uri:
+        # SQLite en memoria no usa QueuePool
+        return options
+    if timed:
+        options["poolclass"] = TimedQueuePool
+    options.update({
+        "pool_size": int(os.getenv("DB_POOL_SIZE", 5)),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 10)),
+        "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", 30)),
+    })
+    return options
+
+
+def init_pool_metrics(engine):
+    # los contadores del engine: los del TimedQueuePool si lo usa
+    stats = getattr(engine.pool, "stats", None) or PoolStats()
+    engine_stats[engine] = stats
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        stats.count("connects")
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        stats.count("checkouts")
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        stats.count("checkins")
+
+
+def pool_status(engine):
+    pool = engine.pool
+    data = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        data.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "max_overflow": pool._max_overflow,
+            "timeout": pool.timeout(),
+        })
+    stats = engine_stats.get(engine) or getattr(pool, "stats", None)
+    if stats is not None:
+        data.update(stats.to_dict())
+    return data
+
+
+def ping(engine):
+    start = time.perf_counter()
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+    return round((time.perf_counter() - start) * 1000, 3)
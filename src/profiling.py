@@ -0,0 +1,206 @@
+# Instrumentación opcional por petición (PROFILING=1):
+#   - tiempos por fase: routing, sql, handler (lo que queda de la vista:
+#     código Python y construcción de la respuesta) y encode (cabecera
+#     Server-Timing)
+#   - número de sentencias SQL por petición y aviso de patrones N+1
+#   - histogramas por endpoint en formato de texto de Prometheus en /metrics
+#   - volcados de cProfile con la cabecera X-Profile: PROFILING_TOKEN (solo
+#     si está definido; sin él la cabecera se ignora), o por muestreo
+# - Cada app tiene su propio Profiler (app.extensions["profiler"]) y lee
+#   estos ajustes de app.config; las variables de entorno son los valores
+#   por defecto.
+
+import os
+import hmac
+import time
+import random
+import cProfile
+import logging
+import threading
+from collections import defaultdict
+from flask import g, request, has_request_context, Response
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+PROFILING = os.getenv("PROFILING", "").lower() in ("1", "true")
+PROFILING_N_PLUS_ONE = int(os.getenv("PROFILING_N_PLUS_ONE", 5))
+PROFILING_DIR = os.getenv("PROFILING_DIR", "/tmp/profiles")
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN")
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", 0))
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for index, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[index] += 1
+
+    def lines(self, name, labels):
+        for bound, count in zip(BUCKETS, self.counts):
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {count}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.count}'
+        yield f'{name}_sum{{{labels}}} {self.sum:.6f}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+
+class Profiler:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.phases = defaultdict(Histogram)
+        self.statements = defaultdict(Histogram)
+        self.n_plus_one = defaultdict(int)
+        self.enabled = False
+        self.n_plus_one_threshold = 0
+        self.profile_dir = None
+        self.profile_token = None
+        self.sample_rate = 0.0
+
+    def init_app(self, app, engine):
+        for name, value in (("PROFILING", PROFILING),
+                            ("PROFILING_N_PLUS_ONE", PROFILING_N_PLUS_ONE),
+                            ("PROFILING_DIR", PROFILING_DIR),
+                            ("PROFILING_TOKEN", PROFILING_TOKEN),
+                            ("PROFILING_SAMPLE_RATE", PROFILING_SAMPLE_RATE)):
+            app.config.setdefault(name, value)
+        app.extensions["profiler"] = self
+        self.enabled = app.config["PROFILING"]
+        if not self.enabled:
+            return
+        self.n_plus_one_threshold = app.config["PROFILING_N_PLUS_ONE"]
+        self.profile_dir = app.config["PROFILING_DIR"]
+        self.profile_token = app.config["PROFILING_TOKEN"]
+        self.sample_rate = app.config["PROFILING_SAMPLE_RATE"]
+        app.wsgi_app = self._wrap_wsgi(app.wsgi_app)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.add_url_rule('/metrics', 'metrics', self.metrics)
+        self._wrap_json(app)
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    # --- fases -----------------------------------------------------------
+
+    def _wrap_wsgi(self, wsgi_app):
+        def middleware(environ, start_response):
+            environ["profiling.start"] = time.perf_counter()
+            if not self._should_profile(environ):
+                return wsgi_app(environ, start_response)
+
+            profile = cProfile.Profile()
+            result = profile.runcall(wsgi_app, environ, start_response)
+            os.makedirs(self.profile_dir, exist_ok=True)
+            path = environ.get("PATH_INFO", "/").strip("/").replace("/", "_") or "root"
+            filename = os.path.join(self.profile_dir, f"{path}-{time.time_ns()}.prof")
+            profile.dump_stats(filename)
+            logger.info("cProfile guardado en %s", filename)
+            return result
+        return middleware
+
+    def _should_profile(self, environ):
+        header = environ.get("HTTP_X_PROFILE")
+        if header and self.profile_token and hmac.compare_digest(
+                header.encode("latin-1"), self.profile_token.encode()):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _wrap_json(self, app):
+        response = app.json.response
+
+        def timed_response(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return response(*args, **kwargs)
+            finally:
+                if has_request_context() and "_profile" in g:
+                    g._profile["encode"] += time.perf_counter() - start
+        app.json.response = timed_response
+
+    def _before_request(self):
+        now = time.perf_counter()
+        start = request.environ.get("profiling.start", now)
+        g._profile = {"start": start, "handler_start": now, "routing": now - start,
+                      "sql": 0.0, "encode": 0.0, "statements": defaultdict(int)}
+
+    def _after_request(self, response):
+        profile = g.pop("_profile", None)
+        if profile is None:
+            return response
+        now = time.perf_counter()
+        handler = now - profile["handler_start"]
+        timings = {
+            "routing": profile["routing"],
+            "sql": profile["sql"],
+            "handler": max(handler - profile["sql"] - profile["encode"], 0.0),
+            "encode": profile["encode"],
+            "total": now - profile["start"],
+        }
+        statements = profile["statements"]
+        count = sum(statements.values())
+        repeated = max(statements.values(), default=0)
+        endpoint = request.endpoint or "unknown"
+
+        with self._lock:
+            for phase, seconds in timings.items():
+                self.phases[(endpoint, phase)].observe(seconds)
+            self.statements[endpoint].observe(count)
+            if repeated >= self.n_plus_one_threshold:
+                self.n_plus_one[endpoint] += 1
+
+        if repeated >= self.n_plus_one_threshold:
+            statement = max(statements, key=statements.get)
+            logger.warning("Posible N+1 en %s: %d ejecuciones de %s",
+                           endpoint, repeated, " ".join(statement.split())[:120])
+            response.headers["X-N-Plus-One"] = str(repeated)
+
+        response.headers["X-SQL-Count"] = str(count)
+        response.headers["Server-Timing"] = ", ".join(
+            f"{phase};dur={seconds * 1000:.3f}" for phase, seconds in timings.items())
+        return response
+
+    # --- SQL -------------------------------------------------------------
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and "_profile" in g:
+            conn.info.setdefault("profiling.query_start", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if not has_request_context() or "_profile" not in g:
+            return
+        starts = conn.info.get("profiling.query_start")
+        if starts:
+            g._profile["sql"] += time.perf_counter() - starts.pop()
+        g._profile["statements"][statement] += 1
+
+    # --- exportación -----------------------------------------------------
+
+    def metrics(self):
+        lines = [
+            "# HELP http_request_phase_seconds Tiempo por fase de cada endpoint.",
+            "# TYPE http_request_phase_seconds histogram",
+        ]
+        with self._lock:
+            for (endpoint, phase), histogram in sorted(self.phases.items()):
+                lines.extend(histogram.lines("http_request_phase_seconds",
+                                             f'endpoint="{endpoint}",phase="{phase}"'))
+            lines.append("# HELP http_request_sql_statements Sentencias SQL por petición.")
+            lines.append("# TYPE http_request_sql_statements histogram")
+            for endpoint, histogram in sorted(self.statements.items()):
+                lines.extend(histogram.lines("http_request_sql_statements",
+                                             f'endpoint="{endpoint}"'))
+            lines.append("# HELP http_request_n_plus_one_total Peticiones con un patrón N+1.")
+            lines.append("# TYPE http_request_n_plus_one_total counter")
+            for endpoint, count in sorted(self.n_plus_one.items()):
+                lines.append(f'http_request_n_plus_one_total{{endpoint="{endpoint}"}} {count}')
+        return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
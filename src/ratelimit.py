@@ -0,0 +1,257 @@
+# Límite de peticiones por cliente y por ruta (token bucket) y control de
+# admisión para las rutas caras. Se activa con RATE_LIMIT=1.
+#
+# - Cada app tiene su propio RateLimiter (app.extensions["limiter"]) y lee
+#   estos ajustes de app.config; las variables de entorno son los valores
+#   por defecto.
+# - Cada (cliente, endpoint) tiene un cubo de n fichas que se rellena a
+#   n/periodo por segundo; cada petición gasta una y sin fichas se
+#   responde 429 con Retry-After. RATE_LIMIT_DEFAULT vale para todas las
+#   rutas, @limit("20/m") lo cambia en una ruta y @limit(None) la excluye.
+# - Backend: por defecto un dict en memoria del proceso, así que con
+#   varios workers de gunicorn el límite efectivo es n × workers. Con
+#   RATE_LIMIT_URL los cubos viven en Redis (o en cualquier servidor
+#   compatible, p. ej. uno local en la misma máquina) y se comparten entre
+#   workers: cada comprobación es un único EVALSHA atómico.
+# - Admisión: las rutas marcadas con @expensive comparten un semáforo de
+#   RATE_LIMIT_MAX_IN_FLIGHT peticiones por proceso; si no queda hueco en
+#   RATE_LIMIT_QUEUE_MS se responde 503 en lugar de esperar una conexión
+#   del pool y dejar sin ella al resto de rutas.
+# - Cliente: la dirección de la conexión. Detrás de proxies,
+#   RATE_LIMIT_TRUSTED_HOPS=n toma la n-ésima entrada de X-Forwarded-For
+#   empezando por la derecha, la que añadió el primero de esos n proxies:
+#   las de más a la izquierda las pone el cliente y no valen.
+# - Si el backend falla la petición pasa (fail open) y se cuenta en errors.
+
+import os
+import math
+import time
+import logging
+import threading
+from collections import OrderedDict
+from flask import g, request, jsonify, current_app
+from werkzeug.local import LocalProxy
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT = os.getenv("RATE_LIMIT", "").lower() in ("1", "true")
+RATE_LIMIT_URL = os.getenv("RATE_LIMIT_URL", "")
+RATE_LIMIT_DEFAULT = os.getenv("RATE_LIMIT_DEFAULT", "120/m")
+# límite de las rutas @expensive (listados completos, /bulk, /home...)
+RATE_LIMIT_EXPENSIVE = os.getenv("RATE_LIMIT_EXPENSIVE", "30/m")
+# proxies de confianza delante de la app (0: se usa la dirección de la conexión)
+RATE_LIMIT_TRUSTED_HOPS = int(os.getenv("RATE_LIMIT_TRUSTED_HOPS", 0))
+# cubos guardados como máximo en memoria (se descartan los más antiguos)
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100000))
+# peticiones caras simultáneas por proceso; por defecto el tamaño del
+# pool, así las conexiones de overflow quedan para las rutas baratas
+RATE_LIMIT_MAX_IN_FLIGHT = int(os.getenv("RATE_LIMIT_MAX_IN_FLIGHT",
+                                         os.getenv("DB_POOL_SIZE", 5)))
+RATE_LIMIT_QUEUE_MS = float(os.getenv("RATE_LIMIT_QUEUE_MS", 50))
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_rate(rule):
+    # "100/m" -> (capacidad, fichas por segundo); también "10/s", "5/30"
+    count, _, period = rule.partition("/")
+    seconds = PERIODS[period] if period in PERIODS else float(period or 1)
+    return int(count), int(count) / seconds
+
+
+# token bucket atómico en Redis: hash con fichas y última actualización
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return {allowed, tostring(tokens)}
+"""
+
+
+class LocalBuckets:
+    # cubos en memoria del proceso, con descarte LRU como LRUCache
+
+    def __init__(self, max_keys):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate):
+        # (permitido, fichas que quedan)
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, tokens
+
+    def size(self):
+        return len(self._buckets)
+
+
+class RedisBuckets:
+    # compatible con cualquier cliente estilo redis-py (register_script)
+
+    def __init__(self, client, key_prefix="ratelimit:"):
+        self.client = client
+        self.key_prefix = key_prefix
+        self.script = client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def take(self, key, capacity, rate):
+        allowed, tokens = self.script(keys=[self.key_prefix + key],
+                                      args=[capacity, rate, time.time()])
+        return bool(allowed), float(tokens)
+
+    def size(self):
+        # sin dato: contarlos exigiría recorrer todas las claves (SCAN) en
+        # cada llamada a /health/db; los cubos caducan solos en Redis
+        return None
+
+
+def create_buckets(config):
+    url = config["RATE_LIMIT_URL"]
+    if url:
+        import redis
+        return RedisBuckets(redis.Redis.from_url(url))
+    return LocalBuckets(config["RATE_LIMIT_MAX_KEYS"])
+
+
+def client_key(forwarded_for, remote_addr, trusted_hops):
+    # IP que vio el primer proxy de confianza; si la cabecera trae menos
+    # entradas la petición no pasó por ellos: dirección de la conexión
+    if trusted_hops and forwarded_for:
+        addresses = [address.strip() for address in forwarded_for.split(",")]
+        if len(addresses) >= trusted_hops and addresses[-trusted_hops]:
+            return addresses[-trusted_hops]
+    return remote_addr or "unknown"
+
+
+def too_many(message, status_code, retry_after):
+    response = jsonify({"error": message})
+    response.status_code = status_code
+    response.headers["Retry-After"] = str(retry_after)
+    return response
+
+
+class RateLimiter:
+    def __init__(self):
+        self.enabled = False
+        self.backend = None
+        self.default = None
+        self.expensive = None
+        self.trusted_hops = 0
+        self.queue_seconds = 0.0
+        self.in_flight = None
+        self.limited = 0
+        self.shed = 0
+        self.errors = 0
+
+    def init_app(self, app):
+        for name, value in (("RATE_LIMIT", RATE_LIMIT), ("RATE_LIMIT_URL", RATE_LIMIT_URL),
+                            ("RATE_LIMIT_DEFAULT", RATE_LIMIT_DEFAULT),
+                            ("RATE_LIMIT_EXPENSIVE", RATE_LIMIT_EXPENSIVE),
+                            ("RATE_LIMIT_TRUSTED_HOPS", RATE_LIMIT_TRUSTED_HOPS),
+                            ("RATE_LIMIT_MAX_KEYS", RATE_LIMIT_MAX_KEYS),
+                            ("RATE_LIMIT_MAX_IN_FLIGHT", RATE_LIMIT_MAX_IN_FLIGHT),
+                            ("RATE_LIMIT_QUEUE_MS", RATE_LIMIT_QUEUE_MS)):
+            app.config.setdefault(name, value)
+        app.extensions["limiter"] = self
+        config = app.config
+        self.enabled = config["RATE_LIMIT"]
+        self.default = parse_rate(config["RATE_LIMIT_DEFAULT"])
+        self.expensive = parse_rate(config["RATE_LIMIT_EXPENSIVE"])
+        self.trusted_hops = config["RATE_LIMIT_TRUSTED_HOPS"]
+        self.queue_seconds = config["RATE_LIMIT_QUEUE_MS"] / 1000
+        self.in_flight = threading.BoundedSemaphore(config["RATE_LIMIT_MAX_IN_FLIGHT"])
+        if not self.enabled:
+            return
+        self.backend = create_buckets(config)
+        app.before_request(self.before_request)
+        app.teardown_request(self.teardown_request)
+
+    def rule(self, view):
+        # (capacidad, ritmo) de la vista, o None si está excluida
+        if hasattr(view, "rate_limit"):
+            return view.rate_limit
+        return self.expensive if getattr(view, "expensive", False) else self.default
+
+    def check(self, client, endpoint, rule):
+        # None si la petición pasa; si no, segundos hasta la siguiente ficha
+        capacity, rate = rule
+        try:
+            allowed, tokens = self.backend.take(f"{client}:{endpoint}", capacity, rate)
+        except Exception as error:
+            self.errors += 1
+            logger.warning("Límite de peticiones no disponible: %s", error)
+            return None
+        if allowed:
+            return None
+        self.limited += 1
+        return max(1, math.ceil((1 - tokens) / rate))
+
+    def before_request(self):
+        # se ejecuta en cada petición: el proxy `request` se resuelve una vez
+        req = request._get_current_object()
+        view = current_app.view_functions.get(req.endpoint)
+        # los preflight de CORS no gastan fichas
+        if view is None or req.method == "OPTIONS":
+            return None
+        rule = self.rule(view)
+        if rule is not None:
+            client = client_key(req.headers.get("X-Forwarded-For"), req.remote_addr,
+                                self.trusted_hops)
+            retry_after = self.check(client, req.endpoint, rule)
+            if retry_after is not None:
+                return too_many("Demasiadas peticiones, reintenta más tarde", 429, retry_after)
+        if getattr(view, "expensive", False):
+            if not self.in_flight.acquire(timeout=self.queue_seconds):
+                self.shed += 1
+                return too_many("Servidor ocupado, reintenta más tarde", 503, 1)
+            g.admitted = True
+        return None
+
+    def teardown_request(self, error=None):
+        # con streaming el contexto (y el hueco) se mantiene hasta el final
+        if g.pop("admitted", False):
+            self.in_flight.release()
+
+    def stats(self):
+        return {"enabled": self.enabled,
+                "backend": type(self.backend).__name__ if self.backend else None,
+                "limited": self.limited, "shed": self.shed, "errors": self.errors,
+                "buckets": self.backend.size() if self.backend else 0}
+
+
+# el RateLimiter de la app en curso
+limiter = LocalProxy(lambda: current_app.extensions["limiter"])
+
+
+def limit(rule):
+    # límite propio de la ruta ("20/m"); None la deja sin límite
+    def decorator(view):
+        view.rate_limit = parse_rate(rule) if rule else None
+        return view
+    return decorator
+
+
+def expensive(view):
+    # ruta cara: RATE_LIMIT_EXPENSIVE (salvo un @limit propio) y control de
+    # admisión
+    view.expensive = True
+    return view
@@ -0,0 +1,170 @@
+# Réplicas de lectura: los SELECT de las peticiones GET/HEAD van a una
+# réplica y todo lo demás al primario.
+#
+#   DATABASE_REPLICA_URLS=postgresql://.../replica1,postgresql://.../replica2
+#
+# - Escrituras: INSERT/UPDATE/DELETE y los flush del ORM usan siempre el
+#   primario; después de la primera escritura el resto de la petición
+#   también (lee lo que acaba de escribir).
+# - Leer lo escrito: tras una escritura con éxito el cliente recibe la
+#   cookie read_primary_until y sus lecturas van al primario durante
+#   REPLICA_MAX_LAG segundos. La cabecera X-Read-Primary: 1 fuerza lo mismo.
+# - Retraso: cada REPLICA_CHECK_INTERVAL segundos se mide el retraso de cada
+#   réplica (solo en Postgres) y se descartan las que pasen de REPLICA_MAX_LAG.
+# - Caídas: una réplica que no responde, o cuya conexión se pierde, queda
+#   fuera hasta la siguiente comprobación; sin réplicas sanas se lee del
+#   primario.
+
+import os
+import time
+import logging
+import itertools
+import threading
+from flask import g, request, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text, Select, CompoundSelect
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.exc import SQLAlchemyError
+from pool_metrics import pool_status
+
+logger = logging.getLogger(__name__)
+
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", 5))
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", 10))
+PRIMARY_COOKIE = "read_primary_until"
+
+# en una réplica en recuperación: segundos desde la última transacción
+# aplicada (crece también si el primario está inactivo, lo que es seguro)
+LAG_QUERY = text(
+    "SELECT CASE WHEN pg_is_in_recovery() "
+    "THEN COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) "
+    "ELSE 0 END")
+
+
+def replica_urls():
+    return [url.strip().replace("postgres://", "postgresql://")
+            for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+
+
+def replica_binds(engine_options):
+    # entradas de SQLALCHEMY_BINDS: "replica0", "replica1", ...
+    return {f"replica{index}": {"url": url, **engine_options(url)}
+            for index, url in enumerate(replica_urls())}
+
+
+class RoutingSession(Session):
+    # db.session: manda los SELECT a la réplica elegida para la petición
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context() and g.get("read_replica") is not None:
+            if self._flushing or isinstance(clause, UpdateBase):
+                # una escritura: desde aquí la petición sigue en el primario
+                g.read_replica = None
+            elif isinstance(clause, (Select, CompoundSelect)):
+                return g.read_replica
+            # el resto (p. ej. get_bind() sin sentencia, para ver el
+            # dialecto) va al primario sin cambiar de dónde se lee
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def use_primary():
+    # el resto de la petición lee del primario (p. ej. antes de leer para
+    # escribir a partir de lo leído)
+    if has_app_context():
+        g.read_replica = None
+
+
+def pinned_to_primary(read_primary, until):
+    # cabecera X-Read-Primary y cookie read_primary_until de la petición
+    if (read_primary or "").lower() in ("1", "true"):
+        return True
+    try:
+        return float(until or 0) > time.time()
+    except ValueError:
+        return False
+
+
+class ReplicaRouter:
+    def __init__(self):
+        self.engines = []
+        self.state = {}
+        self.lock = threading.Lock()
+        self._cycle = None
+
+    def init_app(self, app, db):
+        with app.app_context():
+            keys = sorted(key for key in db.engines
+                          if isinstance(key, str) and key.startswith("replica"))
+            self.engines = [db.engines[key] for key in keys]
+        if not self.engines:
+            return
+        self.state = {engine: {"healthy": True, "lag": None, "checked": 0.0}
+                      for engine in self.engines}
+        self._cycle = itertools.cycle(self.engines)
+        for engine in self.engines:
+            event.listen(engine, "handle_error", self._on_error)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def _on_error(self, context):
+        # conexión perdida con una réplica: fuera hasta la próxima comprobación
+        if context.is_disconnect and context.engine in self.state:
+            self._mark(context.engine, healthy=False, lag=None)
+
+    def _mark(self, engine, healthy, lag):
+        with self.lock:
+            self.state[engine] = {"healthy": healthy, "lag": lag, "checked": time.monotonic()}
+
+    def check(self, engine):
+        try:
+            with engine.connect() as connection:
+                if engine.dialect.name == "postgresql":
+                    lag = float(connection.execute(LAG_QUERY).scalar())
+                else:
+                    connection.execute(text("SELECT 1"))
+                    lag = 0.0
+        except SQLAlchemyError as error:
+            logger.warning("Réplica %s no disponible: %s", engine.url, error)
+            self._mark(engine, healthy=False, lag=None)
+            return False
+        self._mark(engine, healthy=lag <= REPLICA_MAX_LAG, lag=lag)
+        return lag <= REPLICA_MAX_LAG
+
+    def choose(self):
+        # siguiente réplica sana (round robin) o None para usar el primario
+        now = time.monotonic()
+        for _ in range(len(self.engines)):
+            with self.lock:
+                engine = next(self._cycle)
+                state = self.state[engine]
+            if now - state["checked"] >= REPLICA_CHECK_INTERVAL:
+                if self.check(engine):
+                    return engine
+            elif state["healthy"]:
+                return engine
+        return None
+
+    def pinned_to_primary(self):
+        return pinned_to_primary(request.headers.get("X-Read-Primary"),
+                                 request.cookies.get(PRIMARY_COOKIE))
+
+    def _before_request(self):
+        g.read_replica = None
+        if request.method in ("GET", "HEAD") and not self.pinned_to_primary():
+            g.read_replica = self.choose()
+
+    def _after_request(self, response):
+        if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+            until = time.time() + REPLICA_MAX_LAG
+            response.set_cookie(PRIMARY_COOKIE, f"{until:.3f}", max_age=int(REPLICA_MAX_LAG) + 1,
+                                httponly=True, samesite="Lax")
+        return response
+
+    def status(self):
+        with self.lock:
+            return [{"url": engine.url.render_as_string(hide_password=True),
+                     "healthy": state["healthy"], "lag": state["lag"],
+                     "pool": pool_status(engine)}
+                    for engine, state in self.state.items()]
+
+
+router = ReplicaRouter()
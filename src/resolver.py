@@ -0,0 +1,104 @@
+import logging
+from flask import current_app
+from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.local import LocalProxy
+from models import db, User, Planet, People, Vehicle
+from versions import on_commit, still_valid, table_versions
+
+logger = logging.getLogger(__name__)
+
+# campo de la petición -> (modelo, columna por la que se busca)
+LOOKUPS = {
+    "user_name": (User, "first_name"),
+    "user_email": (User, "email"),
+    "planet_name": (Planet, "planet_name"),
+    "vehicle_model": (Vehicle, "model"),
+    "character_name": (People, "name"),
+}
+MODELS = tuple({model: None for model, _ in LOOKUPS.values()})
+
+
+class NameResolver:
+    # Índice en memoria nombre -> id para resolver favoritos sin ir a la
+    # base de datos. Se precarga al arrancar, se actualiza con cada alta y
+    # si un nombre no está se consulta (por índice) y se guarda, así las
+    # altas hechas por otros workers también acaban en el índice.
+    #
+    # Cada tabla guarda la versión (versions.py) con la que se construyó su
+    # parte del índice: si la versión actual es otra (cualquier escritura de
+    # otro worker, o un renombrado o una baja en este) se descarta y se
+    # vuelve a llenar bajo demanda. Las altas de este proceso no la descartan.
+    # Las versiones de todas las tablas se leen juntas, en una consulta por
+    # petición (table_versions() las guarda en g).
+    #
+    # Cada app tiene el suyo (app.extensions["resolver"]).
+
+    def __init__(self):
+        self._ids = {field: {} for field in LOOKUPS}
+        self._versions = {}
+        # campos cargados enteros por warm(): solo en esos remember() no
+        # puede tapar un nombre repetido con id menor
+        self._complete = set()
+
+    def init_app(self, app):
+        app.extensions["resolver"] = self
+        on_commit(app, self.committed)
+
+    def _fields(self, table):
+        return [field for field, (model, _) in LOOKUPS.items() if model.__table__.name == table]
+
+    def _reset(self, table, version):
+        for field in self._fields(table):
+            self._ids[field] = {}
+            self._complete.discard(field)
+        self._versions[table] = version
+
+    def warm(self):
+        try:
+            for table, version in table_versions(MODELS).items():
+                self._reset(table, version)
+            for field, (model, column) in LOOKUPS.items():
+                ids = self._ids[field]
+                for row_id, value in db.session.query(model.id, getattr(model, column)).order_by(model.id):
+                    ids.setdefault(value, row_id)
+                self._complete.add(field)
+        except SQLAlchemyError as error:
+            # p. ej. las tablas aún no existen antes de `flask db upgrade`
+            logger.warning("No se pudo precargar el índice de nombres: %s", error)
+            db.session.rollback()
+
+    def resolve(self, field, value):
+        model, column = LOOKUPS[field]
+        table = model.__table__.name
+        version = table_versions(MODELS)[table]
+        if self._versions.get(table) != version:
+            self._reset(table, version)
+        ids = self._ids[field]
+        row_id = ids.get(value)
+        if row_id is None:
+            row_id = db.session.query(model.id).filter(
+                getattr(model, column) == value).order_by(model.id).limit(1).scalar()
+            if row_id is not None:
+                ids[value] = row_id
+        return row_id
+
+    def remember(self, model, item):
+        # `item` es el serialize() de una fila recién creada (ya confirmada)
+        for field, (lookup_model, column) in LOOKUPS.items():
+            if lookup_model is model and field in self._complete:
+                self._ids[field].setdefault(item[column], item["id"])
+
+    def committed(self, changes):
+        # commit de este proceso: solo altas -> se conserva (remember()
+        # añadirá las filas nuevas); cualquier otro cambio -> se descarta
+        for table, change in changes.items():
+            if table not in self._versions:
+                continue
+            if still_valid(self._versions[table], change):
+                self._versions[table] = change[0]
+            else:
+                self._reset(table, change[0])
+
+
+# el NameResolver de la app en curso
+resolver = LocalProxy(lambda: current_app.extensions["resolver"])
@@ -0,0 +1,201 @@
+# Búsqueda sobre planetas, personajes y vehículos (GET /search?q=).
+# En Postgres usa los índices trigram (pg_trgm) de la base de datos; en
+# el resto (SQLite) un índice invertido en memoria con búsqueda por prefijo,
+# que se carga al arrancar y sigue los cambios de cada tabla.
+
+import os
+import re
+import time
+import heapq
+import logging
+import threading
+from bisect import bisect_left, insort
+from collections import defaultdict
+from flask import current_app
+from sqlalchemy import func, literal, or_, select, union_all
+from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.local import LocalProxy
+from models import db, Planet, People, Vehicle
+from versions import on_commit, table_versions
+
+logger = logging.getLogger(__name__)
+
+# tipo -> (modelo, {columna: peso}); la primera columna es el nombre
+SEARCHABLE = {
+    "planet": (Planet, {"planet_name": 2.0, "climate": 1.0}),
+    "people": (People, {"name": 2.0, "hair_color": 1.0}),
+    "vehicle": (Vehicle, {"model": 2.0, "pilot": 1.0}),
+}
+KINDS = {model: kind for kind, (model, _) in SEARCHABLE.items()}
+
+# cada cuánto se comprueba si otros workers han cambiado las tablas
+SEARCH_REFRESH_SECONDS = float(os.getenv("SEARCH_REFRESH_SECONDS", 5))
+# máximo de términos que puede expandir un prefijo
+MAX_PREFIX_EXPANSIONS = 64
+
+TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return TOKEN.findall(str(text).lower())
+
+
+class SearchIndex:
+    # Cada tipo guarda la versión de su tabla (versions.py) con la que está
+    # al día. sync() vuelve a leer los tipos cuya versión ha cambiado (altas,
+    # cambios y bajas de cualquier worker) y aplica la diferencia; las altas
+    # de este proceso entran antes con add() y los cambios y bajas obligan a
+    # sincronizar en la siguiente búsqueda. Los postings solo se leen o
+    # modifican con _lock. Cada app tiene el suyo (app.extensions).
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.documents = {}
+        self.postings = defaultdict(dict)
+        self.tokens = []
+        self.versions = {}
+        self.synced_at = 0.0
+
+    def init_app(self, app):
+        app.extensions["search_index"] = self
+        on_commit(app, self.committed)
+
+    def add(self, model, item):
+        # `item` es el serialize() de una fila recién creada
+        kind = KINDS.get(model)
+        if kind is not None:
+            with self._lock:
+                self._put(kind, item)
+
+    def _put(self, kind, item):
+        # alta o reemplazo de un documento (con _lock)
+        key = (kind, item["id"])
+        previous = self.documents.get(key)
+        if previous == item:
+            return
+        if previous is not None:
+            self._remove(key)
+        self.documents[key] = item
+        for column, weight in SEARCHABLE[kind][1].items():
+            for token in tokenize(item[column]):
+                posting = self.postings[token]
+                if not posting:
+                    insort(self.tokens, token)
+                posting[key] = max(posting.get(key, 0.0), weight)
+
+    def _remove(self, key):
+        # con _lock
+        item = self.documents.pop(key)
+        for column in SEARCHABLE[key[0]][1]:
+            for token in tokenize(item[column]):
+                posting = self.postings.get(token)
+                if posting is None:
+                    continue
+                posting.pop(key, None)
+                if not posting:
+                    del self.postings[token]
+                    del self.tokens[bisect_left(self.tokens, token)]
+
+    def sync(self):
+        # vuelve a leer los tipos cuya tabla ha cambiado desde la última vez;
+        # la primera vez carga todo el catálogo
+        try:
+            versions = table_versions([model for model, _ in SEARCHABLE.values()])
+            for kind, (model, _) in SEARCHABLE.items():
+                version = versions[model.__table__.name]
+                if self.versions.get(kind) == version:
+                    continue
+                items = [model.serialize_row(row) for row in model.rows()]
+                ids = {item["id"] for item in items}
+                with self._lock:
+                    for key in [key for key in self.documents if key[0] == kind and key[1] not in ids]:
+                        self._remove(key)
+                    for item in items:
+                        self._put(kind, item)
+                    self.versions[kind] = version
+        except SQLAlchemyError as error:
+            # se reintenta en la siguiente búsqueda
+            logger.warning("No se pudo cargar el índice de búsqueda: %s", error)
+            db.session.rollback()
+            return
+        self.synced_at = time.monotonic()
+
+    def committed(self, changes):
+        # commit de este proceso: las altas ya llegan con add(); un cambio o
+        # una baja (p. ej. un renombrado) se sincroniza en la próxima búsqueda
+        for kind, (model, _) in SEARCHABLE.items():
+            change = changes.get(model.__table__.name)
+            if change is not None and change[1] != {"insert"}:
+                self.synced_at = 0.0
+
+    def search(self, query, limit):
+        if time.monotonic() - self.synced_at > SEARCH_REFRESH_SECONDS:
+            self.sync()
+
+        terms = tokenize(query)
+        scores = defaultdict(float)
+        matched = defaultdict(int)
+        with self._lock:
+            for term in terms:
+                hits = {}
+                # coincidencia exacta pesa el doble que la de prefijo
+                for key, weight in self.postings.get(term, {}).items():
+                    hits[key] = weight * 2
+                start = bisect_left(self.tokens, term)
+                for token in self.tokens[start:start + MAX_PREFIX_EXPANSIONS]:
+                    if not token.startswith(term):
+                        break
+                    if token == term:
+                        continue
+                    for key, weight in self.postings[token].items():
+                        hits[key] = max(hits.get(key, 0.0), weight)
+                for key, score in hits.items():
+                    scores[key] += score
+                    matched[key] += 1
+
+            best = heapq.nlargest(limit, scores, key=lambda key: (matched[key], scores[key], -key[1]))
+            return [{"type": key[0], "score": scores[key], "item": self.documents[key]}
+                    for key in best]
+
+
+# el SearchIndex de la app en curso
+search_index = LocalProxy(lambda: current_app.extensions["search_index"])
+
+
+def search_postgres(query, limit):
+    # similarity() y el operador % de pg_trgm usan los índices GIN trigram
+    prefix = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    selects = []
+    for kind, (model, weights) in SEARCHABLE.items():
+        columns = [getattr(model, name) for name in weights]
+        score = None
+        for column, weight in zip(columns, weights.values()):
+            term = func.similarity(column, query) * weight
+            score = term if score is None else score + term
+        conditions = [column.op("%")(query) for column in columns] + \
+                     [column.ilike(prefix) for column in columns]
+        selects.append(select(literal(kind).label("type"), model.id.label("id"), score.label("score"))
+                       .where(or_(*conditions)))
+    ranked = union_all(*selects).subquery()
+    rows = db.session.execute(select(ranked).order_by(ranked.c.score.desc(), ranked.c.id).limit(limit)).all()
+
+    ids = defaultdict(list)
+    for row in rows:
+        ids[row.type].append(row.id)
+    items = {}
+    for kind, kind_ids in ids.items():
+        model, _ = SEARCHABLE[kind]
+        for row in model.rows().filter(model.id.in_(kind_ids)):
+            items[(kind, row.id)] = model.serialize_row(row)
+    return [{"type": row.type, "score": round(float(row.score), 4), "item": items[(row.type, row.id)]}
+            for row in rows]
+
+
+def uses_postgres():
+    return db.engine.dialect.name == "postgresql"
+
+
+def search(query, limit):
+    if uses_postgres():
+        return search_postgres(query, limit)
+    return search_index.search(query, limit)
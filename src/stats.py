@@ -0,0 +1,92 @@
+# Estadísticas de favoritos a partir de la tabla favorite_count.
+#
+# Cada alta o baja de favoritos (POST /favorites, /favorites/bulk,
+# /favorites/batch, DELETE /favorites y el group commit) llama a
+# bump_counts() en su misma transacción: un único INSERT ... ON CONFLICT
+# DO UPDATE SET count = count + n por lote, así las lecturas del top-N no
+# dependen del tamaño de la tabla favorite. rebuild_counts() recalcula
+# todo con GROUP BY (datos cargados por fuera de la API, p. ej. el seed).
+
+from collections import Counter
+from sqlalchemy import delete, func, insert, literal, select, union_all
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from models import db, User, Planet, People, Vehicle, Favorite, FavoriteCount
+
+# columna de favorite -> tipo de contador
+KINDS = {"planet_id": "planet", "vehicles_id": "vehicle", "characters_id": "character"}
+
+# /stats/top/<entidad> -> (tipo de contador, modelo, columna con el nombre)
+LEADERBOARDS = {
+    "planets": ("planet", Planet, Planet.planet_name),
+    "vehicles": ("vehicle", Vehicle, Vehicle.model),
+    "characters": ("character", People, People.name),
+    "users": ("user", User, User.first_name),
+}
+
+
+def favorite_deltas(rows, sign=1):
+    # rows: mappings con user_id, planet_id, vehicles_id y characters_id
+    deltas = Counter()
+    for row in rows:
+        deltas[("user", row["user_id"])] += sign
+        for column, kind in KINDS.items():
+            if row.get(column):
+                deltas[(kind, row[column])] += sign
+    return deltas
+
+
+def increment():
+    # INSERT que suma `count` a la fila existente en lugar de fallar
+    dialect = db.engine.dialect.name
+    if dialect == "mysql":
+        statement = mysql.insert(FavoriteCount)
+        return statement.on_duplicate_key_update(
+            count=FavoriteCount.count + statement.inserted.count)
+    dialects = {"postgresql": postgresql, "sqlite": sqlite}
+    statement = dialects[dialect].insert(FavoriteCount)
+    return statement.on_conflict_do_update(
+        index_elements=["kind", "target_id"],
+        set_={"count": FavoriteCount.count + statement.excluded.count})
+
+
+def bump_counts(rows, sign=1, session=None):
+    session = session or db.session
+    deltas = favorite_deltas(rows, sign)
+    # orden fijo de claves: dos transacciones nunca se bloquean en cruz
+    values = [{"kind": kind, "target_id": target_id, "count": count}
+              for (kind, target_id), count in sorted(deltas.items()) if count]
+    if values:
+        session.execute(increment(), values)
+
+
+def rebuild_counts(session=None):
+    # recálculo completo con GROUP BY sobre favorite
+    session = session or db.session
+    groups = [select(literal("user"), Favorite.user_id, func.count())
+              .group_by(Favorite.user_id)]
+    for column, kind in KINDS.items():
+        target = getattr(Favorite, column)
+        groups.append(select(literal(kind), target, func.count())
+                      .where(target.isnot(None)).group_by(target))
+    session.execute(delete(FavoriteCount))
+    session.execute(insert(FavoriteCount).from_select(
+        ["kind", "target_id", "count"], union_all(*groups)))
+
+
+def top(entity, limit):
+    kind, model, name = LEADERBOARDS[entity]
+    rows = db.session.execute(
+        select(FavoriteCount.target_id, name.label("name"), FavoriteCount.count)
+        .join(model, model.id == FavoriteCount.target_id)
+        .where(FavoriteCount.kind == kind, FavoriteCount.count > 0)
+        .order_by(FavoriteCount.count.desc(), FavoriteCount.target_id.desc())
+        .limit(limit))
+    return [{"id": row.target_id, "name": row.name, "favorites": row.count} for row in rows]
+
+
+def user_counts():
+    # usuarios con su número de favoritos (0 si no tienen), para paginate()
+    return db.session.query(
+        User.id, User.first_name, func.coalesce(FavoriteCount.count, 0).label("favorites")) \
+        .outerjoin(FavoriteCount, (FavoriteCount.kind == "user")
+                   & (FavoriteCount.target_id == User.id))
@@ -0,0 +1,47 @@
+import os
+from flask import request, current_app, Response, stream_with_context
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+# filas que se traen de la base de datos en cada lote
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", 500))
+
+
+def wants_stream():
+    # ?stream=1 o Accept: application/x-ndjson activan el modo streaming
+    if request.args.get("stream", "").lower() in ("1", "true"):
+        return True
+    best = request.accept_mimetypes.best_match(["application/json", NDJSON_MIMETYPE])
+    return best == NDJSON_MIMETYPE
+
+
+def stream_query(query, serialize):
+    # yield_per usa un cursor del lado del servidor (stream_results) en
+    # Postgres, así la memoria se mantiene constante sin importar las filas
+    ndjson = request.accept_mimetypes.best_match(
+        ["application/json", NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+    rows = query.yield_per(STREAM_BATCH_SIZE)
+    provider = current_app.json
+
+    def dumps(obj):
+        # mismo formato compacto que jsonify
+        return provider.dumps(obj, separators=(",", ":"))
+
+    def generate_ndjson():
+        for row in rows:
+            yield dumps(serialize(row)) + "\n"
+
+    def generate_array():
+        yield "["
+        first = True
+        for row in rows:
+            if first:
+                first = False
+                yield dumps(serialize(row))
+            else:
+                yield "," + dumps(serialize(row))
+        yield "]"
+
+    if ndjson:
+        return Response(stream_with_context(generate_ndjson()), mimetype=NDJSON_MIMETYPE)
+    return Response(stream_with_context(generate_array()), mimetype="application/json")
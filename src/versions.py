@@ -0,0 +1,164 @@
+# Versión por tabla (table_version) para ETags, cache y los índices en
+# memoria. Cada transacción que escribe en una tabla de TRACKED incrementa
+# su fila. Se cuentan las escrituras hechas por:
+#
+# - unidad de trabajo del ORM (after_flush): altas, cambios y bajas de
+#   instancias, incluidas las ediciones desde Flask-Admin
+# - insert()/update()/delete() lanzados con session.execute()
+#   (do_orm_execute), p. ej. los /bulk o el DELETE /favorites
+#
+# En SQLite el incremento va justo antes del commit, en la misma
+# transacción (SQLite ya tiene un único escritor). En Postgres y el resto va
+# justo después del commit, en una transacción propia de una sentencia: el
+# bloqueo de la fila dura esa sentencia y no todo el commit, así los
+# escritores de una misma tabla no hacen cola en ella. A cambio, durante
+# ese instante se pueden leer datos nuevos con la versión anterior.
+#
+# Lo que se escriba por fuera de una Session (SQL a mano, migraciones) no
+# cuenta. Una fila nueva empieza en el instante actual en microsegundos, así
+# una base de datos recreada no repite versiones ya vistas por los clientes.
+#
+# Tras el commit se avisa a los listeners que la app en curso registró con
+# on_commit() con {tabla: (versión nueva, {"insert", "update", "delete"})}.
+# Sin contexto de app no se avisa a nadie.
+
+import time
+import logging
+from flask import g, current_app, has_app_context, has_request_context
+from sqlalchemy import event, inspect, insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from models import db, User, Planet, People, Vehicle, Favorite, TableVersion
+
+logger = logging.getLogger(__name__)
+
+TRACKED = {model.__table__.name for model in (User, Planet, People, Vehicle, Favorite)}
+
+TOUCHED = "table_versions.touched"
+COMMITTED = "table_versions.committed"
+PENDING = "table_versions.pending"
+
+def on_commit(app, listener):
+    app.extensions.setdefault("table_versions", []).append(listener)
+    return listener
+
+
+def touch(session, name, operation):
+    if name in TRACKED:
+        session.info.setdefault(TOUCHED, {}).setdefault(name, set()).add(operation)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def collect_statements(state):
+    for operation in ("insert", "update", "delete"):
+        if getattr(state, f"is_{operation}"):
+            touch(state.session, state.statement.table.name, operation)
+
+
+@event.listens_for(Session, "after_flush")
+def collect_flush(session, flush_context):
+    for operation, instances in (("insert", session.new), ("update", session.dirty),
+                                 ("delete", session.deleted)):
+        for instance in instances:
+            if operation == "update" and not session.is_modified(instance):
+                continue
+            touch(session, inspect(instance).mapper.local_table.name, operation)
+
+
+def increment(connection, name):
+    # versión nueva de la tabla; la fila se crea con la primera escritura
+    dialect = connection.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        upsert = {"postgresql": postgresql, "sqlite": sqlite}[dialect].insert
+        statement = upsert(TableVersion).values(name=name, version=time.time_ns() // 1000)
+        return connection.execute(statement.on_conflict_do_update(
+            index_elements=["name"], set_={"version": TableVersion.version + 1})
+            .returning(TableVersion.version)).scalar_one()
+    updated = connection.execute(update(TableVersion).where(TableVersion.name == name)
+                                 .values(version=TableVersion.version + 1)).rowcount
+    if not updated:
+        connection.execute(insert(TableVersion).values(name=name, version=time.time_ns() // 1000))
+    return connection.execute(
+        select(TableVersion.version).where(TableVersion.name == name)).scalar_one()
+
+
+def increment_all(connection, touched):
+    # orden fijo: dos transacciones nunca se bloquean en cruz
+    return {name: (increment(connection, name), touched[name]) for name in sorted(touched)}
+
+
+@event.listens_for(Session, "before_commit")
+def bump_versions(session):
+    # lo pendiente de escribir también cuenta
+    session.flush()
+    touched = session.info.pop(TOUCHED, None)
+    if not touched:
+        return
+    # la conexión de la transacción, la que ha escrito (el primario)
+    connection = session.connection()
+    if connection.dialect.name == "sqlite":
+        session.info[COMMITTED] = increment_all(connection, touched)
+    else:
+        session.info[PENDING] = (connection.engine, touched)
+
+
+def bump_after_commit(engine, touched):
+    # una transacción corta por tabla (autocommit)
+    try:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            return increment_all(connection, touched)
+    except SQLAlchemyError as error:
+        # los datos ya están confirmados: sin versión nueva los listeners
+        # descartan su estado y las ETags se corrigen con la próxima escritura
+        logger.warning("No se pudo incrementar la versión de %s: %s", sorted(touched), error)
+        return {name: (None, operations) for name, operations in touched.items()}
+
+
+@event.listens_for(Session, "after_commit")
+def notify(session):
+    committed = session.info.pop(COMMITTED, None)
+    pending = session.info.pop(PENDING, None)
+    if pending is not None:
+        committed = bump_after_commit(*pending)
+    if committed and has_request_context() and "table_versions" in g:
+        # lo ya leído en esta petición pasa a la versión nueva
+        for name, (version, _) in committed.items():
+            if version is None:
+                g.table_versions.pop(name, None)
+            else:
+                g.table_versions[name] = version
+    if committed and has_app_context():
+        for listener in current_app.extensions.get("table_versions", ()):
+            listener(committed)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def forget(session, previous_transaction):
+    session.info.pop(TOUCHED, None)
+    session.info.pop(COMMITTED, None)
+    session.info.pop(PENDING, None)
+
+
+def versions_query(names):
+    return select(TableVersion.name, TableVersion.version).where(TableVersion.name.in_(names))
+
+
+def table_versions(models, session=None):
+    # {tabla: versión} (0 si aún no se ha escrito), en una sola consulta por
+    # clave primaria; dentro de una petición se reutiliza lo ya leído
+    names = [model.__table__.name for model in models]
+    known = g.setdefault("table_versions", {}) if has_request_context() else {}
+    missing = [name for name in names if name not in known]
+    if missing:
+        found = dict((session or db.session).execute(versions_query(missing)).all())
+        known.update({name: found.get(name, 0) for name in missing})
+    return {name: known[name] for name in names}
+
+
+def still_valid(known, change):
+    # Estado local construido con la versión `known`; `change` es lo que
+    # acaba de confirmar este proceso. Solo sigue valiendo (con la versión
+    # nueva) si el commit solo añadió filas y no hubo otro commit en medio.
+    version, operations = change
+    return operations == {"insert"} and known == version - 1
@@ -0,0 +1,79 @@
+"""
+Query-count regression test for the enriched favorites endpoints: the number
+of SQL statements must not grow with the number of favorites (no N+1).
+"""
+import os
+import sys
+
+import pytest
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from app import create_app  # noqa: E402
+from models import db, User, Planet, People, Vehicle, Favorite  # noqa: E402
+
+SIZES = (1, 30)
+# the first read of /users/<id>/favorites materializes the row and the
+# second one reads it back: both are checked
+READS = (
+    ("favorites", "/favorites"),
+    ("user favorites, first read", "/users/1/favorites"),
+    ("user favorites, materialized", "/users/1/favorites"),
+)
+
+
+def build_app(path, favorites):
+    app = create_app(SQLALCHEMY_DATABASE_URI=f"sqlite:///{path}", ADMIN_ENABLED=False,
+                     SWAGGER_ENABLED=False, MIGRATE_ENABLED=False)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(email="ann@example.com", first_name="Ann",
+                            password="secret", is_active=True))
+        for i in range(favorites):
+            db.session.add(Planet(planet_name=f"planet{i}", periodo_de_rotacion=i,
+                                  climate="arid", poblation=i))
+            db.session.add(People(name=f"character{i}", age=i, hair_color="brown",
+                                  birth_year=i))
+            db.session.add(Vehicle(model=f"vehicle{i}", speed=i, pilot="luke", length=i))
+        db.session.flush()
+        columns = ("planet_id", "vehicles_id", "characters_id")
+        for i in range(favorites):
+            db.session.add(Favorite(user_id=1, **{columns[i % 3]: i // 3 + 1}))
+        db.session.commit()
+    return app
+
+
+def count_statements(app, url):
+    client = app.test_client()
+    with app.app_context():
+        engine = db.engine
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return len(statements)
+
+
+@pytest.fixture(scope="module")
+def counts(tmp_path_factory):
+    # {read: [statements with 1 favorite, statements with N favorites]}
+    results = {}
+    for size in SIZES:
+        app = build_app(tmp_path_factory.mktemp("db") / f"favorites-{size}.db", size)
+        for name, url in READS:
+            results.setdefault(name, []).append(count_statements(app, url))
+    return results
+
+
+@pytest.mark.parametrize("name", [name for name, _ in READS])
+def test_statements_do_not_grow_with_favorites(counts, name):
+    one, many = counts[name]
+    assert one == many, f"{name}: {one} statements for 1 favorite, {many} for {SIZES[1]}"